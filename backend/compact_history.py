@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+History compaction job
+Moves periods older than the horizon to an archive and rolls them into
+per-user, per-year summaries so prediction and calendar reads only scan
+recent documents
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+import server
+
+
+async def run(horizon_days: int, user_ids: list):
+    """Compact the given users, or every user with periods past the horizon"""
+    await server.ensure_indexes()
+
+    if not user_ids:
+        cutoff = (date.today() - timedelta(days=horizon_days)).isoformat()
+        user_ids = await server.db.periods.distinct("user_id", {"start_date": {"$lt": cutoff}})
+
+    started = time.perf_counter()
+    compacted = 0
+    for user_id in user_ids:
+        count = await server.compact_user_history(user_id, horizon_days)
+        if count:
+            server.logger.info(f"Compacted {count} periods for {user_id}")
+        compacted += count
+
+    server.logger.info(
+        f"Compacted {compacted} periods across {len(user_ids)} users "
+        f"in {time.perf_counter() - started:.1f}s (horizon {horizon_days} days)"
+    )
+    server.client.close()
+
+
+def main():
+    """Run the compaction job against MONGO_URL / DB_NAME"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--horizon-days", type=int, default=server.COMPACTION_HORIZON_DAYS,
+                        help="Keep periods newer than this many days as live documents")
+    parser.add_argument("--user", action="append", default=[], dest="users",
+                        help="Only compact this user id (repeatable)")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.horizon_days, args.users))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+CPU-bound cycle analytics shared by the API and its worker processes.
+
+Everything here works on compact tuples of date ordinals and plain strings so
+it can be shipped to a process pool cheaply. Keep this module free of
+database, settings and pydantic imports: worker processes import it directly.
+"""
+
+import calendar
+from datetime import date
+from typing import List, Optional, Tuple
+
+MIN_CYCLE_LENGTH = 15
+MAX_CYCLE_LENGTH = 45
+DEFAULT_PERIOD_DAYS = 5
+
+# (start ordinal, end ordinal or None, flow intensity, notes)
+PeriodRow = Tuple[int, Optional[int], Optional[str], Optional[str]]
+# (next period start, next period end, ovulation, fertile start, fertile end) as ordinals
+CycleWindow = Tuple[int, int, int, int, int]
+# (last period start ordinal, mean cycle length, standard deviation, cycle count)
+CycleStats = Tuple[int, float, float, int]
+
+
+def cycle_length_stats(start_ordinals: List[int], prior_cycle_lengths: List[int] = (),
+                       prior_last_start: Optional[int] = None) -> Optional[CycleStats]:
+    """Mean and spread of realistic cycle lengths between consecutive period starts
+
+    Compacted history comes in as its cycle lengths plus the last compacted start,
+    which links it to the first live period. Live starts at or before it are back-dated
+    entries the summaries don't cover yet, they count once the next compaction run
+    folds them in rather than adding a gap next to ones the summaries already hold.
+    """
+    starts = sorted(start_ordinals)
+    if prior_last_start is not None:
+        starts = [prior_last_start] + [start for start in starts if start > prior_last_start]
+    cycle_lengths = [
+        length for length in list(prior_cycle_lengths) + [curr - prev for prev, curr in zip(starts, starts[1:])]
+        if MIN_CYCLE_LENGTH <= length <= MAX_CYCLE_LENGTH
+    ]
+    if not cycle_lengths:
+        return None
+
+    mean = sum(cycle_lengths) / len(cycle_lengths)
+    std_dev = (sum((x - mean) ** 2 for x in cycle_lengths) / len(cycle_lengths)) ** 0.5
+    return starts[-1], mean, std_dev, len(cycle_lengths)
+
+
+def project_next_cycle(last_start: int, cycle_length: float) -> CycleWindow:
+    """Project the next period, ovulation and fertile window from the last start"""
+    next_start = last_start + int(cycle_length)
+    # Ovulation is typically 14 days before the next period
+    ovulation = next_start - 14
+    # Fertile window is 5 days before ovulation up to the day after
+    return next_start, next_start + DEFAULT_PERIOD_DAYS, ovulation, ovulation - 5, ovulation + 1
+
+
+def month_days(period_rows: List[PeriodRow], year: int, month: int,
+               window: Optional[CycleWindow]) -> List[dict]:
+    """Build the per-day calendar entries for one month"""
+    first = date(year, month, 1).toordinal()
+    last = first + calendar.monthrange(year, month)[1] - 1
+
+    # Only periods overlapping the month matter, earlier rows win like the stored order
+    recorded = {}
+    for start, end, flow, notes in period_rows:
+        end = end if end is not None else start + DEFAULT_PERIOD_DAYS
+        for day in range(max(start, first), min(end, last) + 1):
+            recorded.setdefault(day, (flow, notes))
+
+    days = []
+    for day in range(first, last + 1):
+        period_info = recorded.get(day)
+        is_predicted = bool(window) and window[0] <= day <= window[1]
+        is_ovulation = bool(window) and day == window[2]
+        is_fertile = bool(window) and window[3] <= day <= window[4]
+
+        if period_info is not None or is_predicted:
+            phase = "menstrual"
+        elif is_ovulation:
+            phase = "ovulation"
+        elif is_fertile:
+            phase = "follicular"
+        else:
+            phase = "luteal"
+
+        days.append({
+            "date": date.fromordinal(day),
+            "phase": phase,
+            "is_period": period_info is not None,
+            "is_predicted_period": is_predicted,
+            "is_ovulation": is_ovulation,
+            "is_fertile": is_fertile,
+            "flow_intensity": period_info[0] if period_info else None,
+            "notes": period_info[1] if period_info else None
+        })
+    return days
+
+
+def calendar_month(period_rows: List[PeriodRow], year: int, month: int,
+                   window: Optional[CycleWindow] = None, mean_model: bool = True,
+                   prior_cycle_lengths: List[int] = (), prior_last_start: Optional[int] = None,
+                   archived_rows: List[PeriodRow] = ()) -> Tuple[Optional[CycleStats], List[dict]]:
+    """Cycle statistics and day entries for a month in a single worker round trip
+
+    With mean_model the prediction window comes from the arithmetic-mean model,
+    otherwise the caller's window is used as is. Archived rows only show up on the
+    calendar, their cycles are already part of the prior cycle lengths.
+    """
+    stats = None
+    if mean_model:
+        stats = cycle_length_stats([row[0] for row in period_rows], prior_cycle_lengths, prior_last_start)
+        if stats:
+            window = project_next_cycle(stats[0], stats[1])
+    return stats, month_days(list(archived_rows) + list(period_rows), year, month, window)
+
+
+def summarize_year(period_rows: List[PeriodRow]) -> dict:
+    """Roll one year of periods into cycle lengths and flow counts"""
+    starts = sorted(row[0] for row in period_rows)
+    flow_counts = {}
+    for _, _, flow, _ in period_rows:
+        flow_counts[flow] = flow_counts.get(flow, 0) + 1
+    return {
+        "cycle_lengths": [curr - prev for prev, curr in zip(starts, starts[1:])],
+        "flow_counts": flow_counts,
+        "period_count": len(period_rows),
+        "first_start": starts[0],
+        "last_start": starts[-1]
+    }
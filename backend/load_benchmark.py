@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tenant scaling benchmark for the periods collection
+Seeds a scratch database with a growing number of users and measures
+tenant-scoped handler latency and the query plan at each step
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+import server
+
+BATCH_SIZE = 10000
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return values[max(int(len(values) * fraction) - 1, 0)]
+
+
+def make_user_periods(rng: random.Random, user_id: str, count: int) -> list:
+    """Build a year or so of period documents for one synthetic user"""
+    start = date(2024, 1, 1) + timedelta(days=rng.randint(0, 60))
+    documents = []
+    for seq in range(1, count + 1):
+        documents.append(server.serialize_for_mongo(server.Period(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            start_date=start,
+            end_date=start + timedelta(days=5),
+            seq=seq
+        ).dict()))
+        start += timedelta(days=rng.randint(25, 32))
+    return documents
+
+
+async def seed_users(rng: random.Random, first: int, last: int, periods_per_user: int):
+    """Insert users [first, last) in bulk batches"""
+    batch = []
+    for index in range(first, last):
+        batch.extend(make_user_periods(rng, f"bench_user_{index}", periods_per_user))
+        if len(batch) >= BATCH_SIZE:
+            await server.db.periods.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await server.db.periods.insert_many(batch, ordered=False)
+
+
+async def measure(rng: random.Random, users: int, samples: int) -> dict:
+    """Time the tenant-scoped handlers for randomly chosen users"""
+    latencies = {"get_periods": [], "get_cycle_predictions": []}
+    for _ in range(samples):
+        user_id = f"bench_user_{rng.randrange(users)}"
+
+        started = time.perf_counter()
+        await server.get_periods(user_id=user_id)
+        latencies["get_periods"].append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await server.get_cycle_predictions(model=server.PredictionModel.MEAN, user_id=user_id)
+        latencies["get_cycle_predictions"].append((time.perf_counter() - started) * 1000)
+
+    explain = await server.db.periods.find({"user_id": f"bench_user_{rng.randrange(users)}"}) \
+        .sort("start_date", 1).explain()
+    stats = explain.get("executionStats", {})
+    return {
+        "latencies": latencies,
+        "docs_examined": stats.get("totalDocsExamined", "-"),
+        "keys_examined": stats.get("totalKeysExamined", "-"),
+        "plan": "IXSCAN" if "IXSCAN" in str(explain["queryPlanner"]["winningPlan"]) else "COLLSCAN"
+    }
+
+
+async def run(steps: list, periods_per_user: int, samples: int, seed: int, keep: bool):
+    """Grow the tenant count step by step, measuring after each seeding round"""
+    rng = random.Random(seed)
+    bench_db = f"{os.environ['DB_NAME']}_load_benchmark"
+    server.db = server.client[bench_db]
+    await server.db.periods.drop()
+    await server.ensure_indexes()
+
+    print(f"Database {bench_db}, {periods_per_user} periods per user, {samples} samples per step")
+    print(f"{'users':>8}{'periods p50':>13}{'p95':>8}{'predict p50':>13}{'p95':>8}{'keys':>6}{'docs':>6}  plan")
+
+    seeded = 0
+    for users in steps:
+        await seed_users(rng, seeded, users, periods_per_user)
+        seeded = users
+
+        result = await measure(rng, users, samples)
+        periods_ms = sorted(result["latencies"]["get_periods"])
+        predict_ms = sorted(result["latencies"]["get_cycle_predictions"])
+        print(
+            f"{users:>8}{statistics.median(periods_ms):>13.2f}{percentile(periods_ms, 0.95):>8.2f}"
+            f"{statistics.median(predict_ms):>13.2f}{percentile(predict_ms, 0.95):>8.2f}"
+            f"{result['keys_examined']:>6}{result['docs_examined']:>6}  {result['plan']}"
+        )
+
+    if not keep:
+        await server.client.drop_database(bench_db)
+
+
+def main():
+    """Run the tenant scaling benchmark against MONGO_URL"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", default="1000,10000,100000",
+                        help="Comma separated tenant counts to measure at")
+    parser.add_argument("--periods-per-user", type=int, default=12)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database afterwards")
+    args = parser.parse_args()
+
+    steps = [int(step) for step in args.steps.split(",")]
+    asyncio.run(run(steps, args.periods_per_user, args.samples, args.seed, args.keep))
+
+
+if __name__ == "__main__":
+    main()
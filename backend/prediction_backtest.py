@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Synthetic backtest for cycle prediction models
+Compares the arithmetic-mean model against the recency-weighted (EWMA) model
+on accuracy of the next period start and on compute cost
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, List
+
+from server import (
+    CycleModelState,
+    Period,
+    calculate_cycle_predictions,
+    predict_from_cycle_model,
+    update_cycle_model,
+)
+
+
+def generate_history(rng: random.Random, cycles: int) -> List[date]:
+    """Generate period start dates with a drifting cycle length and occasional shifts"""
+    start = date(2015, 1, 1) + timedelta(days=rng.randint(0, 365))
+    base_length = rng.gauss(28, 2)
+    noise = rng.uniform(0.5, 4)
+
+    starts = [start]
+    for _ in range(cycles):
+        base_length += rng.gauss(0, 0.3)  # Slow drift over the years
+        if rng.random() < 0.02:
+            base_length += rng.choice([-4, 4])  # Occasional regime shift
+        base_length = min(max(base_length, 21), 38)
+        length = int(round(rng.gauss(base_length, noise)))
+        starts.append(starts[-1] + timedelta(days=min(max(length, 15), 45)))
+    return starts
+
+
+def backtest(users: int, cycles: int, warmup: int, half_life: float, seed: int) -> Dict[str, Dict[str, float]]:
+    """Walk forward through each synthetic history predicting every next period start"""
+    rng = random.Random(seed)
+    results = {
+        name: {"errors": [], "seconds": 0.0}
+        for name in ("mean", "ewma")
+    }
+
+    for _ in range(users):
+        starts = generate_history(rng, cycles)
+        periods = [Period(start_date=start) for start in starts]
+        state = CycleModelState(half_life=half_life)
+
+        for i, start in enumerate(starts[:-1]):
+            # Arithmetic mean recomputes over the whole history, as the API does
+            began = time.perf_counter()
+            mean_prediction = calculate_cycle_predictions(periods[:i + 1])
+            results["mean"]["seconds"] += time.perf_counter() - began
+
+            # Weighted model folds in one period at a time
+            began = time.perf_counter()
+            update_cycle_model(state, start)
+            ewma_prediction = predict_from_cycle_model(state)
+            results["ewma"]["seconds"] += time.perf_counter() - began
+
+            if i + 1 < warmup:
+                continue
+
+            actual = starts[i + 1]
+            for name, prediction in (("mean", mean_prediction), ("ewma", ewma_prediction)):
+                if prediction.next_period_start:
+                    results[name]["errors"].append(abs((prediction.next_period_start - actual).days))
+
+    return results
+
+
+def main():
+    """Run the backtest and print a comparison table"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--cycles", type=int, default=120)
+    parser.add_argument("--warmup", type=int, default=3, help="Cycles observed before scoring")
+    parser.add_argument("--half-life", type=float, default=6.0, help="EWMA half-life in cycles")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = backtest(args.users, args.cycles, args.warmup, args.half_life, args.seed)
+
+    print(f"{args.users} users x {args.cycles} cycles, EWMA half-life {args.half_life} cycles")
+    print(f"{'model':<8}{'MAE days':>10}{'<=2 days':>10}{'total ms':>12}{'us/pred':>10}")
+    for name, result in results.items():
+        errors = result["errors"]
+        mae = sum(errors) / len(errors)
+        within = sum(1 for error in errors if error <= 2) / len(errors)
+        predictions = args.users * args.cycles
+        print(
+            f"{name:<8}{mae:>10.2f}{within:>10.1%}"
+            f"{result['seconds'] * 1000:>12.1f}{result['seconds'] * 1e6 / predictions:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -6,24 +8,243 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from pymongo import ASCENDING, ReplaceOne, monitoring
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import multiprocessing
+import time
+import json
+import random
+import threading
+import jwt
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import uuid
 from datetime import datetime, date, timedelta
 from enum import Enum
 
+import cycle_analytics
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Recency-weighted prediction model: older cycles lose half their weight every N cycles
+EWMA_HALF_LIFE_CYCLES = float(os.environ.get('EWMA_HALF_LIFE_CYCLES', '6'))
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Track connection pool usage for the health endpoints
+
+    pymongo calls these from its pool and executor threads, so counters change under a lock.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+    
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "checkout_failures": self.checkout_failures,
+                "max_pool_size": mongo_options["maxPoolSize"],
+                "min_pool_size": mongo_options["minPoolSize"]
+            }
+    
+    def count(self, counter: str, delta: int):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + delta)
+    
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): self.count("open_connections", 1)
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): self.count("open_connections", -1)
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): self.count("checkout_failures", 1)
+    def connection_checked_out(self, event): self.count("checked_out", 1)
+    def connection_checked_in(self, event): self.count("checked_out", -1)
+
+# Authentication: bearer JWTs whose `sub` claim is the user id
+JWT_SECRET = os.environ.get('JWT_SECRET')
+JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
+# Migration only: requests without a token fall back to the legacy single-user account
+ALLOW_ANONYMOUS = os.environ.get('ALLOW_ANONYMOUS', 'false').lower() == 'true'
+DEFAULT_USER_ID = "default_user"
+
+# CPU-heavy analytics move to a process pool once the history passes this many periods.
+# The pool round trip only breaks even with inline work at around 5000 rows (~8 ms either
+# way), while the API reads at most 1000 live periods plus the compacted cycle lengths, so
+# by default every request runs inline. Lower it only for larger histories.
+ANALYTICS_WORKERS = int(os.environ.get('ANALYTICS_WORKERS', '2'))
+ANALYTICS_OFFLOAD_MIN_PERIODS = int(os.environ.get('ANALYTICS_OFFLOAD_MIN_PERIODS', '5000'))
+ANALYTICS_MAX_PENDING = int(os.environ.get('ANALYTICS_MAX_PENDING', str(ANALYTICS_WORKERS * 4)))
+
+# A sequence allocation still in flight after this long is treated as an abandoned write.
+# Keep it well above MONGO_SERVER_SELECTION_TIMEOUT_MS so a write waiting out a failover isn't reclaimed.
+SYNC_WRITE_TIMEOUT_SECONDS = float(os.environ.get('SYNC_WRITE_TIMEOUT_SECONDS', '300'))
+
+# Periods older than the horizon are archived and rolled into per-year summaries by compact_history.py
+COMPACTION_HORIZON_DAYS = int(os.environ.get('COMPACTION_HORIZON_DAYS', '730'))
+
+# Slow-query log: commands over the threshold are logged, a sample also gets its plan captured
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', '0.1'))
+SLOW_QUERY_LOG_FILE = os.environ.get('SLOW_QUERY_LOG_FILE')  # Capped collection when unset
+SLOW_QUERY_LOG_BYTES = int(os.environ.get('SLOW_QUERY_LOG_BYTES', str(16 * 1024 * 1024)))
+
+# Route of the request being served, picked up by the command listener
+current_route: ContextVar[Optional[str]] = ContextVar('current_route', default=None)
+
+# Where each command keeps its filter, and which commands can be explained
+COMMAND_FILTERS = {
+    'find': lambda cmd: cmd.get('filter', {}),
+    'aggregate': lambda cmd: cmd.get('pipeline', []),
+    'count': lambda cmd: cmd.get('query', {}),
+    'distinct': lambda cmd: cmd.get('query', {}),
+    'findAndModify': lambda cmd: cmd.get('query', {}),
+    'update': lambda cmd: [statement.get('q', {}) for statement in cmd.get('updates', [])],
+    'delete': lambda cmd: [statement.get('q', {}) for statement in cmd.get('deletes', [])],
+    'insert': lambda cmd: None,
+}
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete'}
+SESSION_FIELDS = {'$db', 'lsid', '$clusterTime', '$readPreference', 'txnNumber', 'writeConcern',
+                  'readConcern', 'autocommit', 'startTransaction'}
+
+def query_shape(value):
+    """Replace literal values in a filter with their type names"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(item) for item in value]
+    return type(value).__name__
+
+def count_reply_documents(command_name: str, reply: dict) -> Optional[int]:
+    """How many documents a command returned or touched"""
+    if 'cursor' in reply:
+        return len(reply['cursor'].get('firstBatch', reply['cursor'].get('nextBatch', [])))
+    if command_name == 'findAndModify':
+        return 1 if reply.get('value') else 0
+    return reply.get('n')
+
+class SlowQueryMonitor(monitoring.CommandListener):
+    """Log slow Mongo commands and sample their query plans
+
+    Reads that need more than one batch continue with getMore. Open cursors are mapped
+    back to the command that opened them, so slow getMores carry its route and filter
+    and the documents count covers every batch returned so far.
+    """
+    
+    def __init__(self):
+        self.pending = {}
+        self.cursors = {}  # Open cursor id -> (route, database, command name, command, documents so far)
+        self.loop = None  # Set in the startup hook, explain runs on the event loop
+    
+    def started(self, event):
+        # Hot path for every command: keep references only, shape work waits for a slow reply
+        key = (event.connection_id, event.request_id)
+        if event.command_name == 'getMore':
+            cursor_id = event.command['getMore']
+            origin = self.cursors.get(cursor_id)
+            if origin is not None:
+                self.pending[key] = origin[:4] + (cursor_id,)
+            return
+        if event.command_name == 'killCursors':
+            for cursor_id in event.command.get('cursors', []):
+                self.cursors.pop(cursor_id, None)
+            return
+        if event.command_name not in COMMAND_FILTERS:
+            return
+        if event.command.get(event.command_name) == 'slow_queries':
+            return
+        self.pending[key] = (current_route.get(), event.database_name, event.command_name, event.command, None)
+    
+    def follow_cursor(self, pending: tuple, cursor: dict, batch: int) -> int:
+        """Carry an open cursor over to its next getMore, returning its documents so far"""
+        route, database, command_name, command, cursor_id = pending
+        documents = batch + (self.cursors.pop(cursor_id)[-1] if cursor_id in self.cursors else 0)
+        if cursor.get('id'):
+            self.cursors[cursor['id']] = (route, database, command_name, command, documents)
+        return documents
+    
+    def succeeded(self, event):
+        pending = self.pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        documents = count_reply_documents(event.command_name, event.reply)
+        if 'cursor' in event.reply:
+            documents = self.follow_cursor(pending, event.reply['cursor'], documents)
+        if event.duration_micros < SLOW_QUERY_MS * 1000:
+            return
+        
+        route, database, command_name, command, _ = pending
+        command_filter = COMMAND_FILTERS[command_name](command)
+        record = {
+            'route': route,
+            'database': database,
+            'collection': command.get(command_name),
+            'command': event.command_name,
+            'filter_shape': query_shape(command_filter) if command_filter is not None else None,
+            'duration_ms': round(event.duration_micros / 1000, 2),
+            'documents': documents,
+            'recorded_at': datetime.utcnow().isoformat()
+        }
+        logger.warning(
+            f"Slow Mongo {record['command']} on {record['collection']} took {record['duration_ms']} ms "
+            f"(route={record['route']}, filter={record['filter_shape']}, documents={record['documents']})"
+        )
+        
+        if (command_name in EXPLAINABLE_COMMANDS and self.loop
+                and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE):
+            explainable = {key: value for key, value in command.items() if key not in SESSION_FIELDS}
+            self.loop.call_soon_threadsafe(
+                lambda: asyncio.ensure_future(capture_query_plan(record, explainable))
+            )
+    
+    def failed(self, event):
+        pending = self.pending.pop((event.connection_id, event.request_id), None)
+        if pending is not None and pending[4] is not None:
+            self.cursors.pop(pending[4], None)  # The cursor is gone on the server too
+
+# MongoDB connection (Motor connects lazily, the startup hook warms the pool)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+mongo_options = {
+    'maxPoolSize': int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+    'minPoolSize': int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+    'maxIdleTimeMS': int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '0')) or None,
+    'connectTimeoutMS': int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '20000')),
+    'serverSelectionTimeoutMS': int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000')),
+    'socketTimeoutMS': int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '0')) or None,
+    'readPreference': os.environ.get('MONGO_READ_PREFERENCE', 'primary'),
+}
+READINESS_TIMEOUT_SECONDS = float(os.environ.get('READINESS_TIMEOUT_SECONDS', '2'))
+WARM_UP_RETRY_SECONDS = float(os.environ.get('WARM_UP_RETRY_SECONDS', '5'))
+
+pool_monitor = PoolMonitor()
+slow_query_monitor = SlowQueryMonitor()
+client = AsyncIOMotorClient(
+    mongo_url, event_listeners=[pool_monitor, slow_query_monitor], **mongo_options
+)
 db = client[os.environ['DB_NAME']]
+db_ready = False
+warm_up_task: Optional[asyncio.Task] = None
 
 # Create the main app without a prefix
 app = FastAPI()
 
+async def track_route(request: Request):
+    """Remember the route template so slow Mongo commands can be traced back to it"""
+    current_route.set(f"{request.method} {request.scope['route'].path}")
+
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", dependencies=[Depends(track_route)])
 
 # Enums
 class FlowIntensity(str, Enum):
@@ -37,15 +258,21 @@ class CyclePhase(str, Enum):
     OVULATION = "ovulation"
     LUTEAL = "luteal"
 
+class PredictionModel(str, Enum):
+    MEAN = "mean"
+    EWMA = "ewma"
+
 # Models
 class Period(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    user_id: str = "default_user"  # For now, single user
+    user_id: str = DEFAULT_USER_ID
     start_date: date
     end_date: Optional[date] = None
     flow_intensity: FlowIntensity = FlowIntensity.MEDIUM
     notes: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    seq: int = 0  # Per-user change sequence, bumped on every write
 
 class PeriodCreate(BaseModel):
     start_date: date
@@ -60,7 +287,7 @@ class PeriodUpdate(BaseModel):
 
 class CycleData(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    user_id: str = "default_user"
+    user_id: str = DEFAULT_USER_ID
     period_start: date
     period_end: Optional[date] = None
     cycle_length: Optional[int] = None
@@ -88,6 +315,37 @@ class CyclePrediction(BaseModel):
     average_cycle_length: Optional[float] = None
     cycle_regularity: str = "Unknown"
 
+class CycleModelState(BaseModel):
+    user_id: str = DEFAULT_USER_ID
+    half_life: float = EWMA_HALF_LIFE_CYCLES
+    mean: Optional[float] = None
+    variance: float = 0.0
+    cycle_count: int = 0
+    last_start_date: Optional[date] = None
+
+class PeriodSummary(BaseModel):
+    user_id: str = DEFAULT_USER_ID
+    year: int
+    cycle_lengths: List[int] = []  # Gaps between consecutive starts within the year
+    flow_counts: Dict[str, int] = {}
+    period_count: int = 0
+    period_ids: List[str] = []  # Archived periods this summary was built from
+    first_start: date
+    last_start: date
+    compacted_at: datetime = Field(default_factory=datetime.utcnow)
+
+class CalendarMonth(BaseModel):
+    calendar_data: List[DayInfo]
+    predictions: CyclePrediction
+    month: int
+    year: int
+
+class PeriodChanges(BaseModel):
+    upserted: List[Period] = []
+    deleted: List[str] = []
+    cursor: int = 0
+    has_more: bool = False
+
 # Helper functions
 def serialize_for_mongo(data: dict) -> dict:
     """Convert date objects to strings for MongoDB storage"""
@@ -104,7 +362,8 @@ def serialize_for_mongo(data: dict) -> dict:
 def deserialize_from_mongo(data: dict) -> dict:
     """Convert date strings back to date objects from MongoDB"""
     deserialized = {}
-    date_fields = ['start_date', 'end_date', 'created_at']
+    date_fields = ['start_date', 'end_date', 'created_at', 'updated_at', 'last_start_date',
+                   'first_start', 'last_start', 'compacted_at']
     for key, value in data.items():
         if key in date_fields and isinstance(value, str):
             try:
@@ -118,52 +377,180 @@ def deserialize_from_mongo(data: dict) -> dict:
             deserialized[key] = value
     return deserialized
 
-def calculate_cycle_predictions(periods: List[Period]) -> CyclePrediction:
-    """Calculate cycle predictions based on historical period data"""
-    if not periods or len(periods) < 2:
-        return CyclePrediction()
-    
-    # Sort periods by start date
-    sorted_periods = sorted(periods, key=lambda p: p.start_date)
+@asynccontextmanager
+async def allocate_sequence(user_id: str, count: int = 1):
+    """Allocate change sequence number(s) for a user's periods, yielding the last one
+
+    The write must happen inside the block. Each allocation stays listed on the counter
+    until it is released, so the changes feed never serves a cursor past a write that
+    isn't stored yet.
+    """
+    counter_id = f"periods:{user_id}"
+    while True:
+        # Compare-and-set on the counter, the allocation has to know its own first number
+        counter = await db.counters.find_one({"_id": counter_id}, {"seq": 1})
+        current = counter["seq"] if counter else 0
+        allocation = {"seq": current + 1, "allocated_at": datetime.utcnow()}
+        try:
+            if counter is None:
+                await db.counters.insert_one(
+                    {"_id": counter_id, "seq": current + count, "in_flight": [allocation]}
+                )
+                break
+            result = await db.counters.update_one(
+                {"_id": counter_id, "seq": current},
+                {"$set": {"seq": current + count}, "$push": {"in_flight": allocation}}
+            )
+            if result.modified_count:
+                break
+        except DuplicateKeyError:
+            pass  # Another writer created the counter first
+    try:
+        yield current + count
+    finally:
+        released = await db.counters.update_one(
+            {"_id": counter_id}, {"$pull": {"in_flight": {"seq": allocation["seq"]}}}
+        )
+        if released.modified_count == 0:
+            logger.warning(
+                f"Sequence {allocation['seq']} for {user_id} was released after its write timed out, "
+                "clients already past it may miss the change"
+            )
+
+async def stable_sequence(user_id: str) -> int:
+    """Highest sequence number below which every allocated write has been stored"""
+    counter = await db.counters.find_one({"_id": f"periods:{user_id}"})
+    if not counter:
+        return 0
     
-    # Calculate cycle lengths
-    cycle_lengths = []
-    for i in range(1, len(sorted_periods)):
-        prev_start = sorted_periods[i-1].start_date
-        curr_start = sorted_periods[i].start_date
-        cycle_length = (curr_start - prev_start).days
-        if 15 <= cycle_length <= 45:  # Filter unrealistic cycle lengths
-            cycle_lengths.append(cycle_length)
-    
-    if not cycle_lengths:
-        return CyclePrediction()
+    in_flight = counter.get("in_flight", [])
+    expired_before = datetime.utcnow() - timedelta(seconds=SYNC_WRITE_TIMEOUT_SECONDS)
+    if any(allocation["allocated_at"] < expired_before for allocation in in_flight):
+        # Writers died mid-flight, stop holding the feed back for them
+        await db.counters.update_one(
+            {"_id": counter["_id"]},
+            {"$pull": {"in_flight": {"allocated_at": {"$lt": expired_before}}}}
+        )
+        in_flight = [allocation for allocation in in_flight if allocation["allocated_at"] >= expired_before]
     
-    # Calculate average cycle length
-    avg_cycle_length = sum(cycle_lengths) / len(cycle_lengths)
+    if not in_flight:
+        return counter["seq"]
+    return min(allocation["seq"] for allocation in in_flight) - 1
+
+async def ensure_indexes():
+    """Create the indexes the API and maintenance jobs rely on"""
+    await db.periods.create_index([("user_id", ASCENDING), ("start_date", ASCENDING)])
+    await db.periods.create_index([("user_id", ASCENDING), ("id", ASCENDING)])
+    await db.periods.create_index([("user_id", ASCENDING), ("seq", ASCENDING)])
+    await db.period_tombstones.create_index([("user_id", ASCENDING), ("seq", ASCENDING)])
+    await db.cycle_models.create_index("user_id", unique=True)
+    await db.period_summaries.create_index([("user_id", ASCENDING), ("year", ASCENDING)], unique=True)
+    await db.period_archive.create_index([("user_id", ASCENDING), ("id", ASCENDING)], unique=True)
+    await db.period_archive.create_index([("user_id", ASCENDING), ("start_date", ASCENDING)])
+    await db.period_archive.create_index([("user_id", ASCENDING), ("seq", ASCENDING)])
+
+async def backfill_sequences():
+    """Give legacy period documents a sequence number so the changes feed serves them
+
+    Every worker runs this after warm-up, only the first to reach a document stamps it.
+    """
+    async for legacy in db.periods.find({"seq": {"$exists": False}}, {"id": 1, "user_id": 1}):
+        async with allocate_sequence(legacy["user_id"]) as seq:
+            await db.periods.update_one(
+                {"_id": legacy["_id"], "seq": {"$exists": False}},
+                {"$set": {"seq": seq, "updated_at": datetime.utcnow().isoformat()}}
+            )
+
+async def ping_db() -> float:
+    """Ping MongoDB and return the round trip in milliseconds"""
+    started = time.perf_counter()
+    await asyncio.wait_for(client.admin.command('ping'), READINESS_TIMEOUT_SECONDS)
+    return (time.perf_counter() - started) * 1000
+
+async def ensure_slow_query_log():
+    """Create the capped collection that keeps sampled slow query plans"""
+    if SLOW_QUERY_LOG_FILE:
+        return
+    try:
+        if 'slow_queries' not in await db.list_collection_names():
+            await db.create_collection('slow_queries', capped=True, size=SLOW_QUERY_LOG_BYTES)
+    except Exception as e:
+        # Diagnostics only, never hold back readiness for it
+        logger.warning(f"Could not create slow query log collection: {e}")
+
+def append_slow_query_file(record: dict):
+    with open(SLOW_QUERY_LOG_FILE, 'a') as log_file:
+        log_file.write(json.dumps(record, default=str) + '\n')
+
+async def capture_query_plan(record: dict, command: dict):
+    """Explain a slow command and store it with its slow-query record"""
+    try:
+        record['explain'] = await client[record['database']].command(
+            {'explain': command, 'verbosity': 'queryPlanner'}
+        )
+    except Exception as e:
+        record['explain_error'] = str(e)
     
-    # Determine regularity
-    if len(cycle_lengths) >= 3:
-        std_dev = (sum((x - avg_cycle_length) ** 2 for x in cycle_lengths) / len(cycle_lengths)) ** 0.5
-        if std_dev <= 3:
-            regularity = "Regular"
-        elif std_dev <= 7:
-            regularity = "Somewhat Regular"
+    try:
+        if SLOW_QUERY_LOG_FILE:
+            await asyncio.to_thread(append_slow_query_file, record)
         else:
-            regularity = "Irregular"
-    else:
-        regularity = "Not enough data"
-    
-    # Predict next cycle
-    last_period = sorted_periods[-1]
-    next_period_start = last_period.start_date + timedelta(days=int(avg_cycle_length))
-    next_period_end = next_period_start + timedelta(days=5)  # Average period length
-    
-    # Predict ovulation (typically 14 days before next period)
-    next_ovulation = next_period_start - timedelta(days=14)
+            await db.slow_queries.insert_one(record)
+    except Exception as e:
+        logger.warning(f"Could not store slow query plan: {e}")
+
+async def warm_up_db() -> bool:
+    """Open the first pooled connection and make sure indexes exist"""
+    global db_ready
+    try:
+        await ping_db()
+        await ensure_indexes()
+        await ensure_slow_query_log()
+        db_ready = True
+    except Exception as e:
+        logger.warning(f"MongoDB warm-up failed: {e}")
+    return db_ready
+
+async def warm_up_until_ready():
+    """Retry warm-up in the background until MongoDB is reachable, then backfill legacy data"""
+    while not await warm_up_db():
+        await asyncio.sleep(WARM_UP_RETRY_SECONDS)
     
-    # Fertile window (5 days before ovulation + ovulation day)
-    next_fertile_start = next_ovulation - timedelta(days=5)
-    next_fertile_end = next_ovulation + timedelta(days=1)
+    # Runs while already serving, readiness doesn't wait on it
+    try:
+        await backfill_sequences()
+    except Exception as e:
+        logger.warning(f"Sequence backfill failed, the next start retries it: {e}")
+
+def calculate_cycle_predictions(periods: List[Period]) -> CyclePrediction:
+    """Calculate cycle predictions based on historical period data"""
+    stats = cycle_analytics.cycle_length_stats([period.start_date.toordinal() for period in periods])
+    return prediction_from_stats(stats)
+
+def prediction_from_stats(stats: Optional[tuple]) -> CyclePrediction:
+    """Turn arithmetic-mean cycle statistics into a prediction"""
+    if stats is None:
+        return CyclePrediction()
+    last_start, avg_cycle_length, std_dev, cycle_count = stats
+    return build_cycle_prediction(date.fromordinal(last_start), avg_cycle_length, std_dev, cycle_count)
+
+def classify_regularity(std_dev: float, cycle_count: int) -> str:
+    """Describe cycle regularity from the spread of cycle lengths"""
+    if cycle_count < 3:
+        return "Not enough data"
+    if std_dev <= 3:
+        return "Regular"
+    elif std_dev <= 7:
+        return "Somewhat Regular"
+    return "Irregular"
+
+def build_cycle_prediction(last_start: date, avg_cycle_length: float, std_dev: float,
+                           cycle_count: int) -> CyclePrediction:
+    """Project the next cycle from the last period start and the expected cycle length"""
+    next_period_start, next_period_end, next_ovulation, next_fertile_start, next_fertile_end = (
+        date.fromordinal(day)
+        for day in cycle_analytics.project_next_cycle(last_start.toordinal(), avg_cycle_length)
+    )
     
     return CyclePrediction(
         next_period_start=next_period_start,
@@ -172,32 +559,291 @@ def calculate_cycle_predictions(periods: List[Period]) -> CyclePrediction:
         next_fertile_start=next_fertile_start,
         next_fertile_end=next_fertile_end,
         average_cycle_length=round(avg_cycle_length, 1),
-        cycle_regularity=regularity
+        cycle_regularity=classify_regularity(std_dev, cycle_count)
+    )
+
+def apply_cycle_length(state: CycleModelState, cycle_length: int) -> CycleModelState:
+    """Fold one cycle length into the exponentially weighted cycle statistics in O(1)"""
+    if 15 <= cycle_length <= 45:  # Same filter as the arithmetic-mean model
+        if state.mean is None:
+            state.mean = float(cycle_length)
+        else:
+            alpha = 1 - 0.5 ** (1 / state.half_life)
+            delta = cycle_length - state.mean
+            state.mean += alpha * delta
+            state.variance = (1 - alpha) * (state.variance + alpha * delta ** 2)
+        state.cycle_count += 1
+    return state
+
+def update_cycle_model(state: CycleModelState, start_date: date) -> CycleModelState:
+    """Fold one new period start into the weighted cycle model"""
+    if state.last_start_date is not None:
+        apply_cycle_length(state, (start_date - state.last_start_date).days)
+    state.last_start_date = start_date
+    return state
+
+def build_cycle_model(periods: List[Period], user_id: str = DEFAULT_USER_ID,
+                      half_life: float = EWMA_HALF_LIFE_CYCLES, prior_cycle_lengths: List[int] = (),
+                      prior_last_start: Optional[date] = None) -> CycleModelState:
+    """Rebuild the weighted cycle model from compacted history and the live periods"""
+    state = CycleModelState(user_id=user_id, half_life=half_life)
+    for cycle_length in prior_cycle_lengths:
+        apply_cycle_length(state, cycle_length)
+    state.last_start_date = prior_last_start
+    for period in sorted(periods, key=lambda p: p.start_date):
+        if prior_last_start is not None and period.start_date <= prior_last_start:
+            continue  # Back-dated into compacted history, counted by the next compaction run
+        update_cycle_model(state, period.start_date)
+    return state
+
+def predict_from_cycle_model(state: CycleModelState) -> CyclePrediction:
+    """Calculate cycle predictions from the weighted cycle model"""
+    if state.mean is None or state.last_start_date is None:
+        return CyclePrediction()
+    return build_cycle_prediction(
+        state.last_start_date, state.mean, state.variance ** 0.5, state.cycle_count
     )
 
-def get_day_phase(target_date: date, periods: List[Period], predictions: CyclePrediction) -> CyclePhase:
-    """Determine what phase a specific date falls in"""
-    # Check if it's during a recorded period
-    for period in periods:
-        if period.start_date <= target_date <= (period.end_date or period.start_date + timedelta(days=5)):
-            return CyclePhase.MENSTRUAL
+async def get_cycle_model(user_id: str) -> CycleModelState:
+    """Load the persisted weighted cycle model, rebuilding it if missing or stale"""
+    stored = await db.cycle_models.find_one({"user_id": user_id})
+    if stored and stored.get("half_life") == EWMA_HALF_LIFE_CYCLES:
+        return CycleModelState(**deserialize_from_mongo(stored))
+    
+    # Every period write moves the user's sequence, snapshot it to notice writes during the rebuild
+    counter_id = f"periods:{user_id}"
+    counter = await db.counters.find_one({"_id": counter_id}) or {}
+    prior_cycle_lengths, prior_last_start = await load_compacted_history(user_id)
+    state = build_cycle_model(
+        await find_user_periods(user_id), user_id,
+        prior_cycle_lengths=prior_cycle_lengths, prior_last_start=prior_last_start
+    )
+    if counter.get("in_flight"):
+        return state  # A write is still landing and may be missing, persist on a later read
+    
+    try:
+        if stored:
+            # Only replace the stale model that was read, like advance_cycle_model
+            await db.cycle_models.replace_one(
+                {
+                    "user_id": user_id,
+                    "half_life": stored.get("half_life"),
+                    "cycle_count": stored.get("cycle_count"),
+                    "last_start_date": stored.get("last_start_date")
+                },
+                serialize_for_mongo(state.dict())
+            )
+        else:
+            await db.cycle_models.insert_one(serialize_for_mongo(state.dict()))
+    except DuplicateKeyError:
+        return state  # Another request stored its rebuild first
+    
+    # A write that landed while rebuilding found no model to advance, drop ours so it isn't lost
+    latest = await db.counters.find_one({"_id": counter_id}) or {}
+    if latest.get("seq") != counter.get("seq"):
+        await db.cycle_models.delete_one({"user_id": user_id})
+    return state
+
+async def advance_cycle_model(user_id: str, start_date: date):
+    """Apply a newly recorded period to the persisted weighted cycle model"""
+    stored = await db.cycle_models.find_one({"user_id": user_id})
+    if not stored:
+        return  # Built lazily on the next weighted prediction
     
-    # Check if it's a predicted period
-    if predictions.next_period_start and predictions.next_period_end:
-        if predictions.next_period_start <= target_date <= predictions.next_period_end:
-            return CyclePhase.MENSTRUAL
+    state = CycleModelState(**deserialize_from_mongo(stored))
+    if state.last_start_date and start_date < state.last_start_date:
+        # Back-filled history can't be applied incrementally, rebuild on next read
+        await db.cycle_models.delete_one({"user_id": user_id})
+        return
     
-    # Check if it's ovulation
-    if predictions.next_ovulation and target_date == predictions.next_ovulation:
-        return CyclePhase.OVULATION
+    update_cycle_model(state, start_date)
+    # Only replace the state that was read, a concurrent writer may have advanced it
+    result = await db.cycle_models.replace_one(
+        {
+            "user_id": user_id,
+            "cycle_count": stored.get("cycle_count"),
+            "last_start_date": stored.get("last_start_date")
+        },
+        serialize_for_mongo(state.dict())
+    )
+    if result.matched_count == 0:
+        await db.cycle_models.delete_one({"user_id": user_id})
+
+async def load_compacted_history(user_id: str) -> Tuple[List[int], Optional[date]]:
+    """Cycle lengths from a user's yearly summaries and the last compacted period start"""
+    summaries = await db.period_summaries.find(
+        {"user_id": user_id}, {"_id": 0, "cycle_lengths": 1, "first_start": 1, "last_start": 1}
+    ).sort("year", ASCENDING).to_list(None)
+    
+    cycle_lengths = []
+    last_start = None
+    for summary in summaries:
+        first_start = date.fromisoformat(summary["first_start"])
+        if last_start is not None:
+            cycle_lengths.append((first_start - last_start).days)  # Gap across the year boundary
+        cycle_lengths.extend(summary["cycle_lengths"])
+        last_start = date.fromisoformat(summary["last_start"])
+    return cycle_lengths, last_start
+
+async def compact_user_history(user_id: str, horizon_days: int = COMPACTION_HORIZON_DAYS) -> int:
+    """Move a user's periods older than the horizon to the archive and summarize them per year
+
+    Every step is safe to repeat: archived documents are keyed by period id and each
+    touched year's summary is rebuilt from the archive, so a re-run after a crash never
+    counts a period twice. Archived periods keep their sequence numbers and stay in the
+    period list, calendar and changes feed. Returns the number of periods compacted.
+    """
+    cutoff = (date.today() - timedelta(days=horizon_days)).isoformat()
+    periods = await db.periods.find(
+        {"user_id": user_id, "start_date": {"$lt": cutoff}}, {"_id": 0}
+    ).to_list(None)
+    if not periods:
+        return 0
     
-    # Check if it's fertile window
-    if (predictions.next_fertile_start and predictions.next_fertile_end and 
-        predictions.next_fertile_start <= target_date <= predictions.next_fertile_end):
-        return CyclePhase.FOLLICULAR
+    # Keep the full documents, notes and end dates included
+    await db.period_archive.bulk_write([
+        ReplaceOne({"user_id": user_id, "id": period["id"]}, period, upsert=True)
+        for period in periods
+    ])
+    
+    for year in sorted({date.fromisoformat(period["start_date"]).year for period in periods}):
+        archived = await db.period_archive.find(
+            {"user_id": user_id, "start_date": {"$gte": f"{year:04d}-01-01", "$lt": f"{year + 1:04d}-01-01"}},
+            {"_id": 0, "id": 1, "start_date": 1, "flow_intensity": 1}
+        ).to_list(None)
+        compacted = cycle_analytics.summarize_year([
+            (date.fromisoformat(period["start_date"]).toordinal(), None, period.get("flow_intensity"), None)
+            for period in archived
+        ])
+        summary = PeriodSummary(
+            user_id=user_id,
+            year=year,
+            cycle_lengths=compacted["cycle_lengths"],
+            flow_counts=compacted["flow_counts"],
+            period_count=compacted["period_count"],
+            period_ids=sorted(period["id"] for period in archived),
+            first_start=date.fromordinal(compacted["first_start"]),
+            last_start=date.fromordinal(compacted["last_start"])
+        )
+        await db.period_summaries.replace_one(
+            {"user_id": user_id, "year": year}, serialize_for_mongo(summary.dict()), upsert=True
+        )
+    
+    # Not a delete for syncing clients, the archived copies keep serving the same seq
+    period_ids = [period["id"] for period in periods]
+    await db.periods.delete_many({"user_id": user_id, "id": {"$in": period_ids}})
+    return len(period_ids)
+
+def prediction_window(predictions: CyclePrediction) -> Optional[tuple]:
+    """Compact ordinal form of a prediction for the analytics workers"""
+    if not predictions.next_period_start:
+        return None
+    return tuple(day.toordinal() for day in (
+        predictions.next_period_start, predictions.next_period_end, predictions.next_ovulation,
+        predictions.next_fertile_start, predictions.next_fertile_end
+    ))
+
+analytics_pool: Optional[ProcessPoolExecutor] = None
+analytics_slots = asyncio.Semaphore(max(ANALYTICS_MAX_PENDING, 1))
+analytics_metrics = {"waiting": 0, "running": 0, "offloaded": 0, "inline": 0, "pool_restarts": 0}
+
+def get_analytics_pool() -> ProcessPoolExecutor:
+    """The analytics worker pool, created again after a broken pool was discarded"""
+    global analytics_pool
+    if analytics_pool is None:
+        analytics_pool = ProcessPoolExecutor(
+            max_workers=ANALYTICS_WORKERS, mp_context=multiprocessing.get_context('spawn')
+        )
+    return analytics_pool
+
+async def start_analytics_pool():
+    """Spawn the analytics workers up front so no request pays for process start-up"""
+    if ANALYTICS_WORKERS <= 0:
+        return
+    pool = get_analytics_pool()
+    loop = asyncio.get_running_loop()
+    # Workers spawn on demand, one no-op job per worker brings them all up
+    await asyncio.gather(*(loop.run_in_executor(pool, int) for _ in range(ANALYTICS_WORKERS)))
+
+def discard_analytics_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next offload starts fresh workers"""
+    global analytics_pool
+    if analytics_pool is pool:  # Another caller may already have replaced it
+        analytics_pool = None
+        analytics_metrics["pool_restarts"] += 1
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def run_analytics(func, *args, size: int):
+    """Run a cycle_analytics function inline, or in the process pool for large histories"""
+    if ANALYTICS_WORKERS <= 0 or size < ANALYTICS_OFFLOAD_MIN_PERIODS:
+        analytics_metrics["inline"] += 1
+        return func(*args)
+    
+    # Bounded queue: callers wait here rather than piling work onto the pool
+    analytics_metrics["waiting"] += 1
+    async with analytics_slots:
+        analytics_metrics["waiting"] -= 1
+        analytics_metrics["running"] += 1
+        try:
+            for attempt in range(2):
+                pool = get_analytics_pool()
+                try:
+                    result = await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+                    analytics_metrics["offloaded"] += 1
+                    return result
+                except BrokenProcessPool:
+                    # A worker died, restart the pool and retry once before running inline
+                    logger.warning(f"Analytics worker pool broke (attempt {attempt + 1}), restarting it")
+                    discard_analytics_pool(pool)
+            analytics_metrics["inline"] += 1
+            return func(*args)
+        finally:
+            analytics_metrics["running"] -= 1
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def get_current_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> str:
+    """Resolve the requesting user from the bearer token"""
+    if credentials is None:
+        if ALLOW_ANONYMOUS:
+            return DEFAULT_USER_ID
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    if not JWT_SECRET:
+        raise HTTPException(status_code=401, detail="Token authentication is not configured")
+    
+    try:
+        payload = jwt.decode(
+            credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM],
+            options={"require": ["exp", "sub"]}
+        )
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
     
-    # Default to luteal phase
-    return CyclePhase.LUTEAL
+    if not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Token has no subject")
+    return str(payload["sub"])
+
+async def find_user_periods(user_id: str) -> List[Period]:
+    """Load a user's periods in start date order via the (user_id, start_date) index"""
+    periods = await db.periods.find({"user_id": user_id}).sort("start_date", ASCENDING).to_list(1000)
+    return [Period(**deserialize_from_mongo(period)) for period in periods]
+
+async def find_archived_periods(user_id: str) -> List[Period]:
+    """Load a user's compacted periods in start date order"""
+    periods = await db.period_archive.find({"user_id": user_id}).sort("start_date", ASCENDING).to_list(None)
+    return [Period(**deserialize_from_mongo(period)) for period in periods]
+
+def period_row(period: dict) -> tuple:
+    """Compact calendar row for a stored period document"""
+    return (
+        date.fromisoformat(period["start_date"]).toordinal(),
+        date.fromisoformat(period["end_date"]).toordinal() if period.get("end_date") else None,
+        period.get("flow_intensity"),
+        period.get("notes")
+    )
 
 # API Routes
 @api_router.get("/")
@@ -205,101 +851,159 @@ async def root():
     return {"message": "Menstrual Cycle Tracker API"}
 
 @api_router.post("/periods", response_model=Period)
-async def create_period(period_data: PeriodCreate):
+async def create_period(period_data: PeriodCreate, user_id: str = Depends(get_current_user_id)):
     """Create a new period entry"""
-    period = Period(**period_data.dict())
-    period_dict = serialize_for_mongo(period.dict())
-    result = await db.periods.insert_one(period_dict)
+    period = Period(**period_data.dict(), user_id=user_id)
+    async with allocate_sequence(period.user_id) as seq:
+        period.seq = seq
+        await db.periods.insert_one(serialize_for_mongo(period.dict()))
+    await advance_cycle_model(period.user_id, period.start_date)
     return period
 
 @api_router.get("/periods", response_model=List[Period])
-async def get_periods():
-    """Get all periods for the user"""
-    periods = await db.periods.find({"user_id": "default_user"}).to_list(1000)
-    return [Period(**deserialize_from_mongo(period)) for period in periods]
+async def get_periods(user_id: str = Depends(get_current_user_id)):
+    """Get all periods for the user, compacted history included"""
+    periods = await find_user_periods(user_id)
+    live_ids = {period.id for period in periods}
+    # A period can sit in both collections while a compaction run is interrupted
+    archived = [period for period in await find_archived_periods(user_id) if period.id not in live_ids]
+    return archived + periods
+
+@api_router.get("/periods/changes", response_model=PeriodChanges)
+async def get_period_changes(since: int = 0, limit: int = 500,
+                             user_id: str = Depends(get_current_user_id)):
+    """Get period inserts, updates and deletes after the given sync cursor"""
+    if since < 0 or not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor or limit")
+    
+    # Only serve changes up to the point where no earlier write is still in flight
+    stable_seq = await stable_sequence(user_id)
+    query = {"user_id": user_id, "seq": {"$gt": since, "$lte": stable_seq}}
+    periods = await db.periods.find(query).sort("seq", ASCENDING).to_list(limit + 1)
+    archived = await db.period_archive.find(query).sort("seq", ASCENDING).to_list(limit + 1)
+    # Older compaction runs left tombstones for archived periods, those weren't deletes
+    tombstones = await db.period_tombstones.find(
+        dict(query, compacted={"$ne": True})
+    ).sort("seq", ASCENDING).to_list(limit + 1)
+    
+    # Merge the streams in sequence order and cut at the page boundary
+    live_ids = {period["id"] for period in periods}
+    changes = sorted(
+        [(period["seq"], period, False) for period in periods] +
+        [(period["seq"], period, False) for period in archived if period["id"] not in live_ids] +
+        [(tombstone["seq"], tombstone, True) for tombstone in tombstones],
+        key=lambda change: change[0]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    return PeriodChanges(
+        upserted=[Period(**deserialize_from_mongo(doc)) for _, doc, deleted in changes if not deleted],
+        deleted=[doc["id"] for _, doc, deleted in changes if deleted],
+        cursor=changes[-1][0] if changes else since,
+        has_more=has_more
+    )
 
 @api_router.put("/periods/{period_id}", response_model=Period)
-async def update_period(period_id: str, period_update: PeriodUpdate):
+async def update_period(period_id: str, period_update: PeriodUpdate,
+                        user_id: str = Depends(get_current_user_id)):
     """Update an existing period"""
+    if not await db.periods.find_one({"id": period_id, "user_id": user_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Period not found")
+    
     update_data = {k: v for k, v in period_update.dict().items() if v is not None}
-    update_data = serialize_for_mongo(update_data)
+    update_data["updated_at"] = datetime.utcnow()
     
-    result = await db.periods.update_one(
-        {"id": period_id, "user_id": "default_user"},
-        {"$set": update_data}
-    )
+    async with allocate_sequence(user_id) as seq:
+        update_data["seq"] = seq
+        result = await db.periods.update_one(
+            {"id": period_id, "user_id": user_id},
+            {"$set": serialize_for_mongo(update_data)}
+        )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Period not found")
     
-    updated_period = await db.periods.find_one({"id": period_id})
+    updated_period = await db.periods.find_one({"id": period_id, "user_id": user_id})
     return Period(**deserialize_from_mongo(updated_period))
 
 @api_router.delete("/periods/{period_id}")
-async def delete_period(period_id: str):
+async def delete_period(period_id: str, user_id: str = Depends(get_current_user_id)):
     """Delete a period entry"""
-    result = await db.periods.delete_one({"id": period_id, "user_id": "default_user"})
+    result = await db.periods.delete_one({"id": period_id, "user_id": user_id})
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Period not found")
     
+    # Leave a tombstone so syncing clients learn about the delete
+    async with allocate_sequence(user_id) as seq:
+        await db.period_tombstones.insert_one({
+            "id": period_id,
+            "user_id": user_id,
+            "seq": seq,
+            "deleted_at": datetime.utcnow().isoformat()
+        })
+    await db.cycle_models.delete_one({"user_id": user_id})
+    
     return {"message": "Period deleted successfully"}
 
 @api_router.get("/cycle-predictions", response_model=CyclePrediction)
-async def get_cycle_predictions():
+async def get_cycle_predictions(model: PredictionModel = PredictionModel.MEAN,
+                                user_id: str = Depends(get_current_user_id)):
     """Get cycle predictions based on historical data"""
-    periods = await db.periods.find({"user_id": "default_user"}).to_list(1000)
-    period_objects = [Period(**deserialize_from_mongo(period)) for period in periods]
-    return calculate_cycle_predictions(period_objects)
+    if model == PredictionModel.EWMA:
+        return predict_from_cycle_model(await get_cycle_model(user_id))
+    
+    periods = await db.periods.find({"user_id": user_id}, {"_id": 0, "start_date": 1}).to_list(1000)
+    starts = [date.fromisoformat(period["start_date"]).toordinal() for period in periods]
+    prior_cycle_lengths, prior_last_start = await load_compacted_history(user_id)
+    stats = await run_analytics(
+        cycle_analytics.cycle_length_stats, starts, prior_cycle_lengths,
+        prior_last_start.toordinal() if prior_last_start else None,
+        size=len(starts) + len(prior_cycle_lengths)
+    )
+    return prediction_from_stats(stats)
 
-@api_router.get("/calendar/{year}/{month}")
-async def get_calendar_data(year: int, month: int):
+@api_router.get("/calendar/{year}/{month}", response_model=CalendarMonth)
+async def get_calendar_data(year: int, month: int, model: PredictionModel = PredictionModel.MEAN,
+                            user_id: str = Depends(get_current_user_id)):
     """Get calendar data for a specific month"""
-    # Get periods
-    periods = await db.periods.find({"user_id": "default_user"}).to_list(1000)
-    period_objects = [Period(**deserialize_from_mongo(period)) for period in periods]
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Invalid month")
     
-    # Get predictions
-    predictions = calculate_cycle_predictions(period_objects)
+    # Get periods as compact rows, skipping model validation for the whole history
+    row_fields = {"_id": 0, "start_date": 1, "end_date": 1, "flow_intensity": 1, "notes": 1}
+    periods = await db.periods.find({"user_id": user_id}, row_fields).sort("start_date", ASCENDING).to_list(1000)
+    period_rows = [period_row(period) for period in periods]
     
-    # Generate calendar data for the month
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        end_date = date(year, month + 1, 1) - timedelta(days=1)
+    # Compacted periods overlapping the month, a bounded range on (user_id, start_date)
+    month_start = date(year, month, 1)
+    month_end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    archived = await db.period_archive.find(
+        {"user_id": user_id, "start_date": {
+            "$gte": (month_start - timedelta(days=cycle_analytics.MAX_CYCLE_LENGTH)).isoformat(),
+            "$lt": month_end.isoformat()
+        }},
+        row_fields
+    ).sort("start_date", ASCENDING).to_list(None)
+    archived_rows = [period_row(period) for period in archived]
     
-    calendar_data = []
-    current_date = start_date
-    
-    while current_date <= end_date:
-        # Find if this date has a period
-        period_info = None
-        for period in period_objects:
-            if period.start_date <= current_date <= (period.end_date or period.start_date + timedelta(days=5)):
-                period_info = period
-                break
-        
-        # Determine day info
-        day_info = DayInfo(
-            date=current_date,
-            phase=get_day_phase(current_date, period_objects, predictions),
-            is_period=period_info is not None,
-            is_predicted_period=(
-                predictions.next_period_start and predictions.next_period_end and
-                predictions.next_period_start <= current_date <= predictions.next_period_end
-            ),
-            is_ovulation=(predictions.next_ovulation == current_date),
-            is_fertile=(
-                predictions.next_fertile_start and predictions.next_fertile_end and
-                predictions.next_fertile_start <= current_date <= predictions.next_fertile_end
-            ),
-            flow_intensity=period_info.flow_intensity if period_info else None,
-            notes=period_info.notes if period_info else None
+    # Get predictions and the day entries
+    if model == PredictionModel.EWMA:
+        predictions = predict_from_cycle_model(await get_cycle_model(user_id))
+        _, calendar_data = await run_analytics(
+            cycle_analytics.calendar_month, period_rows, year, month,
+            prediction_window(predictions), False, (), None, archived_rows,
+            size=len(period_rows) + len(archived_rows)
         )
-        
-        calendar_data.append(day_info)
-        current_date += timedelta(days=1)
+    else:
+        prior_cycle_lengths, prior_last_start = await load_compacted_history(user_id)
+        stats, calendar_data = await run_analytics(
+            cycle_analytics.calendar_month, period_rows, year, month, None, True, prior_cycle_lengths,
+            prior_last_start.toordinal() if prior_last_start else None, archived_rows,
+            size=len(period_rows) + len(archived_rows) + len(prior_cycle_lengths)
+        )
+        predictions = prediction_from_stats(stats)
     
     return {
         "calendar_data": calendar_data,
@@ -308,6 +1012,30 @@ async def get_calendar_data(year: int, month: int):
         "year": year
     }
 
+# Health checks for the load balancer (outside the /api prefix)
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the worker is up, with current connection pool usage"""
+    return {
+        "status": "ok",
+        "db_ready": db_ready,
+        "pool": pool_monitor.snapshot(),
+        "analytics": dict(analytics_metrics, workers=ANALYTICS_WORKERS, max_pending=ANALYTICS_MAX_PENDING)
+    }
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: only report ready once MongoDB is warmed up and answering pings"""
+    if not db_ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up", "pool": pool_monitor.snapshot()})
+    
+    try:
+        latency_ms = await ping_db()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "db_unavailable", "error": str(e)})
+    
+    return {"status": "ready", "db_latency_ms": round(latency_ms, 2), "pool": pool_monitor.snapshot()}
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -326,6 +1054,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_db_client():
+    global warm_up_task
+    if ALLOW_ANONYMOUS:
+        logger.warning(
+            "ALLOW_ANONYMOUS is enabled: every request without a bearer token shares "
+            f"the '{DEFAULT_USER_ID}' account. Set ALLOW_ANONYMOUS=false once clients send tokens."
+        )
+    slow_query_monitor.loop = asyncio.get_running_loop()
+    try:
+        await start_analytics_pool()
+    except Exception as e:
+        # Offloaded requests start a fresh pool or fall back to running inline
+        logger.warning(f"Could not start analytics workers: {e}")
+    # Warm up in the background, /readyz keeps the worker out of rotation meanwhile
+    warm_up_task = asyncio.create_task(warm_up_until_ready())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    global analytics_pool
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    client.close()
+    if analytics_pool is not None:
+        analytics_pool.shutdown(cancel_futures=True)
+        analytics_pool = None
\ No newline at end of file
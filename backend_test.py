@@ -37,6 +37,25 @@ class MenstrualCycleAPITester:
             self.log(f"❌ API connection error: {str(e)}", "ERROR")
             return False
     
+    def test_health_endpoints(self) -> bool:
+        """Test liveness and readiness probes"""
+        root_url = self.base_url[:-len("/api")]
+        try:
+            response = self.session.get(f"{root_url}/healthz")
+            if response.status_code != 200 or "pool" not in response.json():
+                self.log(f"❌ Health check failed: {response.status_code}", "ERROR")
+                return False
+            
+            response = self.session.get(f"{root_url}/readyz")
+            if response.status_code == 200 and "db_latency_ms" in response.json():
+                self.log(f"✅ Worker ready, DB latency {response.json()['db_latency_ms']} ms")
+                return True
+            self.log(f"❌ Readiness check failed: {response.status_code}", "ERROR")
+            return False
+        except Exception as e:
+            self.log(f"❌ Health check error: {str(e)}", "ERROR")
+            return False
+    
     def create_test_period(self, start_date: str, end_date: str = None, 
                           flow_intensity: str = "medium", notes: str = None) -> Dict[str, Any]:
         """Create a test period entry"""
@@ -204,6 +223,53 @@ class MenstrualCycleAPITester:
         
         return True
     
+    def test_period_changes_sync(self) -> bool:
+        """Test delta sync endpoint for periods"""
+        self.log("\n=== Testing Period Changes Sync ===")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/periods/changes", params={"since": 0})
+            if response.status_code != 200:
+                self.log(f"❌ Failed to get period changes: {response.status_code}", "ERROR")
+                return False
+            
+            changes = response.json()
+            for field in ["upserted", "deleted", "cursor", "has_more"]:
+                if field not in changes:
+                    self.log(f"❌ Missing field in changes response: {field}", "ERROR")
+                    return False
+            self.log(f"✅ Full sync returned cursor {changes['cursor']}")
+            
+            # A write after the cursor must show up in the next delta
+            cursor = changes["cursor"]
+            period = self.create_test_period("2024-03-01", "2024-03-05", "light", "Sync test")
+            if not period:
+                return False
+            
+            response = self.session.get(f"{self.base_url}/periods/changes", params={"since": cursor})
+            delta = response.json()
+            if [p["id"] for p in delta["upserted"]] == [period["id"]] and delta["cursor"] > cursor:
+                self.log("✅ Delta sync returned only the new period")
+            else:
+                self.log(f"❌ Unexpected delta sync response: {delta}", "ERROR")
+                return False
+            
+            # Deletes must come back as tombstones
+            cursor = delta["cursor"]
+            self.session.delete(f"{self.base_url}/periods/{period['id']}")
+            self.created_period_ids.remove(period["id"])
+            response = self.session.get(f"{self.base_url}/periods/changes", params={"since": cursor})
+            if response.json()["deleted"] == [period["id"]]:
+                self.log("✅ Delta sync returned tombstone for deleted period")
+            else:
+                self.log("❌ Deleted period missing from delta sync", "ERROR")
+                return False
+            
+            return True
+        except Exception as e:
+            self.log(f"❌ Error testing period changes: {str(e)}", "ERROR")
+            return False
+    
     def test_cycle_predictions(self) -> bool:
         """Test cycle prediction algorithm"""
         self.log("\n=== Testing Cycle Predictions ===")
@@ -441,10 +507,18 @@ class MenstrualCycleAPITester:
             if not self.test_api_connection():
                 return False
             
+            # Test health probes
+            if not self.test_health_endpoints():
+                return False
+            
             # Test Period CRUD operations
             if not self.test_period_crud_operations():
                 return False
             
+            # Test delta sync
+            if not self.test_period_changes_sync():
+                return False
+            
             # Test cycle predictions
             if not self.test_cycle_predictions():
                 return False
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend runs as a flat module directory (uvicorn server:app from backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """Point the server at a fresh in-memory MongoDB"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import server
+
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(server, "client", client)
+    monkeypatch.setattr(server, "db", client["test_database"])
+    monkeypatch.setattr(server, "db_ready", False)
+    return server.db
+
+
+@pytest.fixture
+def api(mongo, monkeypatch):
+    """HTTP client for the app backed by the in-memory database"""
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    import server
+
+    monkeypatch.setattr(server, "ANALYTICS_WORKERS", 0)  # Keep app start-up free of worker processes
+    with TestClient(server.app) as test_client:
+        yield test_client
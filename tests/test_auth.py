@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+
+import server
+
+SECRET = "test-secret-that-is-long-enough-for-hs256"
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch):
+    monkeypatch.setattr(server, "JWT_SECRET", SECRET)
+
+
+def auth(user_id: str, secret: str = SECRET) -> dict:
+    claims = {"sub": user_id, "exp": datetime.now(timezone.utc) + timedelta(hours=1)}
+    return {"Authorization": "Bearer " + jwt.encode(claims, secret, algorithm="HS256")}
+
+
+def test_missing_token_rejected_when_anonymous_disabled(api, monkeypatch):
+    monkeypatch.setattr(server, "ALLOW_ANONYMOUS", False)
+    assert api.get("/api/periods").status_code == 401
+
+
+def test_missing_token_uses_default_user_when_anonymous_allowed(api, monkeypatch):
+    monkeypatch.setattr(server, "ALLOW_ANONYMOUS", True)
+    period = api.post("/api/periods", json={"start_date": "2025-01-01"}).json()
+    assert period["user_id"] == server.DEFAULT_USER_ID
+
+
+def test_bad_signature_rejected(api):
+    response = api.get("/api/periods", headers=auth("alice", secret="some-other-secret-of-good-length!"))
+    assert response.status_code == 401
+
+
+def test_token_without_expiry_rejected(api):
+    token = jwt.encode({"sub": "alice"}, SECRET, algorithm="HS256")
+    response = api.get("/api/periods", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_expired_token_rejected(api):
+    claims = {"sub": "alice", "exp": datetime.now(timezone.utc) - timedelta(minutes=1)}
+    token = jwt.encode(claims, SECRET, algorithm="HS256")
+    response = api.get("/api/periods", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_token_without_subject_rejected(api):
+    token = jwt.encode({"name": "alice", "exp": datetime.now(timezone.utc) + timedelta(hours=1)},
+                       SECRET, algorithm="HS256")
+    response = api.get("/api/periods", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_users_cannot_touch_each_others_periods(api):
+    period = api.post("/api/periods", json={"start_date": "2025-01-01"}, headers=auth("alice")).json()
+    assert period["user_id"] == "alice"
+
+    assert api.get("/api/periods", headers=auth("bob")).json() == []
+    assert api.put(f"/api/periods/{period['id']}", json={"notes": "x"}, headers=auth("bob")).status_code == 404
+    assert api.delete(f"/api/periods/{period['id']}", headers=auth("bob")).status_code == 404
+
+    periods = api.get("/api/periods", headers=auth("alice")).json()
+    assert [(p["id"], p["notes"]) for p in periods] == [(period["id"], None)]
+
+
+def test_changes_feed_and_tombstones_are_per_user(api):
+    alice_period = api.post("/api/periods", json={"start_date": "2025-01-01"}, headers=auth("alice")).json()
+    bob_period = api.post("/api/periods", json={"start_date": "2025-02-01"}, headers=auth("bob")).json()
+    api.delete(f"/api/periods/{bob_period['id']}", headers=auth("bob"))
+
+    alice_feed = api.get("/api/periods/changes", headers=auth("alice")).json()
+    assert [p["id"] for p in alice_feed["upserted"]] == [alice_period["id"]]
+    assert alice_feed["deleted"] == []
+    assert alice_feed["cursor"] == 1
+
+    bob_feed = api.get("/api/periods/changes", headers=auth("bob")).json()
+    assert bob_feed["upserted"] == []
+    assert bob_feed["deleted"] == [bob_period["id"]]
+    assert bob_feed["cursor"] == 2
@@ -0,0 +1,179 @@
+import asyncio
+import random
+from datetime import date, timedelta
+
+import cycle_analytics
+import server
+
+
+def history(seed=7, first=date(2016, 1, 3), until=date(2026, 1, 1)):
+    rng, start, starts = random.Random(seed), first, []
+    while start < until:
+        starts.append(start)
+        start += timedelta(days=rng.randint(22, 36))
+    return starts
+
+
+def test_summarize_year():
+    rows = [(date(2020, 3, 1).toordinal(), None, "heavy", None),
+            (date(2020, 1, 2).toordinal(), None, "light", None),
+            (date(2020, 1, 30).toordinal(), None, "heavy", None)]
+    summary = cycle_analytics.summarize_year(rows)
+    assert summary == {
+        "cycle_lengths": [28, 31],
+        "flow_counts": {"heavy": 2, "light": 1},
+        "period_count": 3,
+        "first_start": date(2020, 1, 2).toordinal(),
+        "last_start": date(2020, 3, 1).toordinal()
+    }
+
+
+def test_summaries_reproduce_uncompacted_stats():
+    starts = [start.toordinal() for start in history()]
+    live = [start for start in starts if start >= date(2023, 6, 1).toordinal()]
+
+    # Same chaining as load_compacted_history: in-year gaps plus the gaps across years
+    prior_lengths, prior_last = [], None
+    for year in sorted({date.fromordinal(s).year for s in starts if s not in live}):
+        summary = cycle_analytics.summarize_year(
+            [(s, None, "medium", None) for s in starts if s not in live and date.fromordinal(s).year == year]
+        )
+        if prior_last is not None:
+            prior_lengths.append(summary["first_start"] - prior_last)
+        prior_lengths.extend(summary["cycle_lengths"])
+        prior_last = summary["last_start"]
+
+    assert cycle_analytics.cycle_length_stats(live, prior_lengths, prior_last) == \
+        cycle_analytics.cycle_length_stats(starts)
+
+
+async def seed(user_id, starts):
+    for i, start in enumerate(starts):
+        await server.create_period(server.PeriodCreate(
+            start_date=start, end_date=start + timedelta(days=4), notes=f"note {i}"
+        ), user_id=user_id)
+
+
+async def predictions(user_id):
+    mean = await server.get_cycle_predictions(model=server.PredictionModel.MEAN, user_id=user_id)
+    await server.db.cycle_models.delete_many({"user_id": user_id})
+    ewma = await server.get_cycle_predictions(model=server.PredictionModel.EWMA, user_id=user_id)
+    return mean, ewma
+
+
+def test_compaction_keeps_predictions_and_archives_documents(mongo):
+    async def scenario():
+        await seed("alice", history())
+        before = await predictions("alice")
+        total = await mongo.periods.count_documents({})
+
+        compacted = await server.compact_user_history("alice", horizon_days=900)
+        after = await predictions("alice")
+        archived = await mongo.period_archive.find_one({"user_id": "alice", "notes": "note 0"})
+        return before, after, total, compacted, archived
+
+    before, after, total, compacted, archived = asyncio.run(scenario())
+    assert 0 < compacted < total
+    assert after == before
+    assert archived["end_date"] == "2016-01-07"
+
+
+def test_rerun_after_crash_does_not_double_count(mongo):
+    async def scenario():
+        await seed("alice", history())
+        before = await predictions("alice")
+        await server.compact_user_history("alice", horizon_days=900)
+        summaries = await mongo.period_summaries.find({}, {"_id": 0, "compacted_at": 0}).to_list(None)
+
+        # Crash before the delete: the archived periods are still live
+        async for period in mongo.period_archive.find({}, {"_id": 0}):
+            await mongo.periods.insert_one(period)
+        await server.compact_user_history("alice", horizon_days=900)
+
+        rerun = await mongo.period_summaries.find({}, {"_id": 0, "compacted_at": 0}).to_list(None)
+        return before, await predictions("alice"), summaries, rerun, await mongo.period_archive.count_documents({})
+
+    before, after, summaries, rerun, archived = asyncio.run(scenario())
+    assert rerun == summaries
+    assert archived == sum(summary["period_count"] for summary in summaries)
+    assert after == before
+
+
+def test_later_runs_merge_including_back_dated_entries(mongo):
+    starts = history()
+    in_2017 = [start for start in starts if start.year == 2017]
+    back_dated = in_2017[3] + (in_2017[4] - in_2017[3]) / 2  # Between two compacted periods
+
+    async def scenario():
+        await seed("alice", starts)
+        await server.compact_user_history("alice", horizon_days=3000)  # Older years first
+        await seed("alice", [back_dated])  # Lands inside an already compacted year
+        await server.compact_user_history("alice", horizon_days=900)
+        after = await predictions("alice")
+
+        await seed("bob", sorted(starts + [back_dated]))
+        return after, await predictions("bob"), await mongo.period_summaries.find_one(
+            {"user_id": "alice", "year": 2017})
+
+    after, uncompacted, summary_2017 = asyncio.run(scenario())
+    assert after == uncompacted
+    assert summary_2017["period_count"] == len([s for s in starts if s.year == 2017]) + 1
+    assert len(summary_2017["period_ids"]) == summary_2017["period_count"]
+
+
+def test_back_dated_live_period_waits_for_next_compaction():
+    prior_last = date(2023, 5, 20).toordinal()
+    live = [date(2023, 6, 17).toordinal(), date(2023, 7, 15).toordinal()]
+    back_dated = date(2023, 4, 30).toordinal()
+    assert cycle_analytics.cycle_length_stats(live + [back_dated], [28, 30], prior_last) == \
+        cycle_analytics.cycle_length_stats(live, [28, 30], prior_last)
+
+
+def test_back_dated_entry_does_not_skew_compacted_predictions(mongo):
+    starts = history()
+    in_2017 = [start for start in starts if start.year == 2017]
+
+    async def scenario():
+        await seed("alice", starts)
+        await server.compact_user_history("alice", horizon_days=900)
+        before = await predictions("alice")
+        await seed("alice", [in_2017[3] + (in_2017[4] - in_2017[3]) / 2])
+        return before, await predictions("alice")
+
+    before, after = asyncio.run(scenario())
+    assert after == before
+
+
+def test_compacted_periods_stay_visible(mongo):
+    starts = history()
+
+    async def scenario():
+        await seed("alice", starts)
+        listed = await server.get_periods(user_id="alice")
+        feed = await server.get_period_changes(since=0, limit=1000, user_id="alice")
+        march = await server.get_calendar_data(2017, 3, user_id="alice")
+
+        await server.compact_user_history("alice", horizon_days=900)
+        return (listed, feed, march, await server.get_periods(user_id="alice"),
+                await server.get_period_changes(since=0, limit=1000, user_id="alice"),
+                await server.get_period_changes(since=feed.cursor, limit=1000, user_id="alice"),
+                await server.get_calendar_data(2017, 3, user_id="alice"))
+
+    listed, feed, march, listed_after, feed_after, delta, march_after = asyncio.run(scenario())
+    assert [p.id for p in listed_after] == [p.id for p in listed]
+    assert [p.notes for p in listed_after] == [p.notes for p in listed]
+    assert [p.id for p in feed_after.upserted] == [p.id for p in feed.upserted]
+    assert delta.upserted == [] and delta.deleted == []
+    assert march_after["calendar_data"] == march["calendar_data"]
+    assert any(day["is_period"] for day in march_after["calendar_data"])
+
+
+def test_legacy_compaction_tombstones_are_not_served(mongo):
+    async def scenario():
+        await seed("alice", [date(2025, 1, 1)])
+        await mongo.period_tombstones.insert_one(
+            {"id": "old", "user_id": "alice", "seq": 1, "deleted_at": "2025-01-02", "compacted": True}
+        )
+        return await server.get_period_changes(since=0, limit=500, user_id="alice")
+
+    assert asyncio.run(scenario()).deleted == []
@@ -0,0 +1,163 @@
+import asyncio
+import random
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+
+import pytest
+
+import cycle_analytics
+import server
+
+
+def baseline_month(periods, year, month, predictions):
+    """The original per-day loop from get_calendar_data, kept as the reference"""
+    start_date = date(year, month, 1)
+    end_date = (date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)) - timedelta(days=1)
+
+    def covers(period, day):
+        return period["start"] <= day <= (period["end"] or period["start"] + timedelta(days=5))
+
+    days = []
+    current = start_date
+    while current <= end_date:
+        period_info = next((p for p in periods if covers(p, current)), None)
+        is_predicted = bool(predictions.next_period_start and
+                            predictions.next_period_start <= current <= predictions.next_period_end)
+        is_fertile = bool(predictions.next_fertile_start and
+                          predictions.next_fertile_start <= current <= predictions.next_fertile_end)
+        is_ovulation = predictions.next_ovulation == current
+        if any(covers(p, current) for p in periods) or is_predicted:
+            phase = "menstrual"
+        elif is_ovulation:
+            phase = "ovulation"
+        elif is_fertile:
+            phase = "follicular"
+        else:
+            phase = "luteal"
+        days.append({
+            "date": current,
+            "phase": phase,
+            "is_period": period_info is not None,
+            "is_predicted_period": is_predicted,
+            "is_ovulation": is_ovulation,
+            "is_fertile": is_fertile,
+            "flow_intensity": period_info["flow"] if period_info else None,
+            "notes": period_info["notes"] if period_info else None
+        })
+        current += timedelta(days=1)
+    return days
+
+
+def random_history(seed, count=40):
+    rng = random.Random(seed)
+    start, periods = date(2023, 1, 5), []
+    for i in range(count):
+        end = start + timedelta(days=rng.randint(2, 8)) if rng.random() < 0.7 else None
+        periods.append({"start": start, "end": end, "flow": rng.choice(["light", "medium", "heavy"]),
+                        "notes": f"note {i}"})
+        start += timedelta(days=rng.randint(12, 40))
+    return periods
+
+
+def rows(periods):
+    return [(p["start"].toordinal(), p["end"].toordinal() if p["end"] else None, p["flow"], p["notes"])
+            for p in periods]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_calendar_month_matches_baseline_day_loop(seed):
+    periods = random_history(seed)
+    predictions = server.calculate_cycle_predictions([server.Period(start_date=p["start"]) for p in periods])
+    last = periods[-1]["start"]
+
+    for year, month in [(2023, 1), (2024, 2), (last.year, last.month), (2025, 12),
+                        (predictions.next_period_start.year, predictions.next_period_start.month)]:
+        stats, days = cycle_analytics.calendar_month(rows(periods), year, month)
+        assert server.prediction_from_stats(stats) == predictions
+        assert days == baseline_month(periods, year, month, predictions)
+
+
+def test_month_days_without_prediction():
+    periods = [{"start": date(2025, 3, 30), "end": date(2025, 4, 2), "flow": "heavy", "notes": None}]
+    days = cycle_analytics.month_days(rows(periods), 2025, 4, None)
+    assert days == baseline_month(periods, 2025, 4, server.CyclePrediction())
+    assert [d["is_period"] for d in days[:3]] == [True, True, False]
+
+
+def test_calendar_month_with_caller_window_skips_mean_model():
+    periods = random_history(1)
+    window = (date(2026, 1, 10).toordinal(),) * 5
+    stats, days = cycle_analytics.calendar_month(rows(periods), 2026, 1, window, False)
+    assert stats is None
+    assert [d["date"] for d in days if d["is_ovulation"]] == [date(2026, 1, 10)]
+
+
+class BrokenPool:
+    def __init__(self):
+        self.shut_down = False
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pool_is_replaced_and_retried(monkeypatch):
+    broken = BrokenPool()
+    monkeypatch.setattr(server, "analytics_pool", broken)
+    monkeypatch.setattr(server, "ANALYTICS_OFFLOAD_MIN_PERIODS", 1)
+    monkeypatch.setattr(server, "ANALYTICS_WORKERS", 1)
+    monkeypatch.setitem(server.analytics_metrics, "pool_restarts", 0)
+
+    pools = []
+
+    def get_analytics_pool():
+        if server.analytics_pool is None:
+            server.analytics_pool = "fresh"
+        pools.append(server.analytics_pool)
+        return server.analytics_pool
+
+    async def run_in_executor(self, pool, func, *args):
+        if isinstance(pool, BrokenPool):
+            raise BrokenProcessPool("worker died")
+        return func(*args)
+
+    monkeypatch.setattr(server, "get_analytics_pool", get_analytics_pool)
+    monkeypatch.setattr(asyncio.BaseEventLoop, "run_in_executor", run_in_executor)
+
+    result = asyncio.run(server.run_analytics(cycle_analytics.cycle_length_stats, [0, 28], size=2))
+    assert result == (28, 28.0, 0.0, 1)
+    assert pools == [broken, "fresh"]
+    assert broken.shut_down
+    assert server.analytics_metrics["pool_restarts"] == 1
+
+
+def test_pool_that_keeps_breaking_falls_back_inline(monkeypatch):
+    monkeypatch.setattr(server, "analytics_pool", None)
+    monkeypatch.setattr(server, "ANALYTICS_OFFLOAD_MIN_PERIODS", 1)
+    monkeypatch.setattr(server, "ANALYTICS_WORKERS", 1)
+    monkeypatch.setattr(server, "get_analytics_pool", BrokenPool)
+    monkeypatch.setattr(server, "analytics_metrics", dict(server.analytics_metrics, offloaded=0, inline=0))
+
+    async def run_in_executor(self, pool, func, *args):
+        raise BrokenProcessPool("worker died")
+
+    monkeypatch.setattr(asyncio.BaseEventLoop, "run_in_executor", run_in_executor)
+
+    result = asyncio.run(server.run_analytics(cycle_analytics.cycle_length_stats, [0, 28], size=2))
+    assert result == (28, 28.0, 0.0, 1)
+    assert server.analytics_metrics["offloaded"] == 0
+    assert server.analytics_metrics["inline"] == 1
+
+
+def test_startup_brings_up_every_analytics_worker(monkeypatch):
+    monkeypatch.setattr(server, "ANALYTICS_WORKERS", 3)
+    jobs = []
+
+    async def run_in_executor(self, pool, func, *args):
+        jobs.append((pool, func))
+        return func(*args)
+
+    monkeypatch.setattr(server, "get_analytics_pool", lambda: "pool")
+    monkeypatch.setattr(asyncio.BaseEventLoop, "run_in_executor", run_in_executor)
+
+    asyncio.run(server.start_analytics_pool())
+    assert jobs == [("pool", int)] * 3
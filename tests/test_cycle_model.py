@@ -0,0 +1,170 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+import server
+
+
+def starts_from(lengths, first=date(2024, 1, 1)):
+    starts = [first]
+    for length in lengths:
+        starts.append(starts[-1] + timedelta(days=length))
+    return starts
+
+
+def test_rebuild_matches_incremental_updates():
+    starts = starts_from([28, 30, 27, 50, 29, 31, 26, 28])
+    rebuilt = server.build_cycle_model([server.Period(start_date=start) for start in reversed(starts)])
+
+    incremental = server.CycleModelState()
+    for start in starts:
+        server.update_cycle_model(incremental, start)
+
+    assert rebuilt.mean == pytest.approx(incremental.mean)
+    assert rebuilt.variance == pytest.approx(incremental.variance)
+    assert rebuilt.cycle_count == incremental.cycle_count == 7  # The 50 day gap is filtered
+    assert rebuilt.last_start_date == starts[-1]
+
+
+def test_half_life_halves_weight_of_old_cycles():
+    # After one half-life of 35 day cycles, the 25 day history counts for half the mean
+    state = server.CycleModelState(half_life=4)
+    for start in starts_from([25] * 20 + [35] * 4):
+        server.update_cycle_model(state, start)
+    assert state.mean == pytest.approx(30.0)
+
+
+def test_shorter_half_life_tracks_recent_cycles_faster():
+    starts = starts_from([25] * 10 + [35] * 3)
+    fast, slow = server.CycleModelState(half_life=1), server.CycleModelState(half_life=12)
+    for start in starts:
+        server.update_cycle_model(fast, start)
+        server.update_cycle_model(slow, start)
+    assert 25 < slow.mean < fast.mean < 35
+
+
+def test_prediction_uses_weighted_mean_and_last_start():
+    state = server.build_cycle_model([server.Period(start_date=s) for s in starts_from([28, 28, 28])])
+    prediction = server.predict_from_cycle_model(state)
+    assert prediction.next_period_start == date(2024, 1, 1) + timedelta(days=28 * 4)
+    assert prediction.average_cycle_length == 28.0
+    assert prediction.cycle_regularity == "Regular"
+
+
+def test_prediction_is_empty_without_a_cycle():
+    state = server.build_cycle_model([server.Period(start_date=date(2024, 1, 1))])
+    assert server.predict_from_cycle_model(state) == server.CyclePrediction()
+
+
+class StaleReadCollection:
+    """Collection whose next find_one returns the state from before a concurrent write"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def find_one(self, *args, **kwargs):
+        stored = await self.collection.find_one(*args, **kwargs)
+        await self.collection.update_one({"user_id": "alice"}, {"$inc": {"cycle_count": 1}})
+        return stored
+
+
+class StaleReadDatabase:
+    def __init__(self, database):
+        self.database = database
+
+    def __getattr__(self, name):
+        if name == "cycle_models":
+            return StaleReadCollection(self.database.cycle_models)
+        return getattr(self.database, name)
+
+
+def test_concurrent_advance_drops_model_instead_of_losing_a_cycle(mongo, monkeypatch):
+    async def build():
+        for start in starts_from([28, 28]):
+            await server.create_period(server.PeriodCreate(start_date=start), user_id="alice")
+        await server.get_cycle_model("alice")
+
+    asyncio.run(build())
+    monkeypatch.setattr(server, "db", StaleReadDatabase(mongo))
+    asyncio.run(server.advance_cycle_model("alice", date(2024, 3, 24)))
+
+    # The stale write is refused and the model is dropped for a rebuild on next read
+    assert asyncio.run(mongo.cycle_models.find_one({"user_id": "alice"})) is None
+
+
+def test_sequential_advance_keeps_model(mongo):
+    async def scenario():
+        for start in starts_from([28, 28]):
+            await server.create_period(server.PeriodCreate(start_date=start), user_id="alice")
+        await server.get_cycle_model("alice")
+        await server.create_period(server.PeriodCreate(start_date=date(2024, 3, 25)), user_id="alice")
+        return await mongo.cycle_models.find_one({"user_id": "alice"})
+
+    assert asyncio.run(scenario())["cycle_count"] == 3
+
+
+class WriteDuringReadDatabase:
+    """Database where a period is created right after the rebuild read the live periods"""
+
+    def __init__(self, database):
+        self.database = database
+
+    def __getattr__(self, name):
+        if name == "periods":
+            return ConcurrentCreateCollection(self.database)
+        return getattr(self.database, name)
+
+
+class ConcurrentCreateCollection:
+    def __init__(self, database):
+        self.database = database
+
+    def find(self, *args, **kwargs):
+        self.cursor = self.database.periods.find(*args, **kwargs)
+        return self
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    async def to_list(self, length):
+        periods = await self.cursor.to_list(length)
+        # The create finds no model to advance, the rebuild already read without it
+        async with server.allocate_sequence("alice") as seq:
+            await self.database.periods.insert_one(server.serialize_for_mongo(
+                server.Period(user_id="alice", start_date=date(2024, 3, 24), seq=seq).dict()
+            ))
+        return periods
+
+
+def test_rebuild_racing_a_create_is_not_persisted(mongo, monkeypatch):
+    async def seed():
+        for start in starts_from([28, 28]):
+            await server.create_period(server.PeriodCreate(start_date=start), user_id="alice")
+
+    asyncio.run(seed())
+    monkeypatch.setattr(server, "db", WriteDuringReadDatabase(mongo))
+    asyncio.run(server.get_cycle_model("alice"))
+
+    # The rebuild may have missed the new period, so it is dropped rather than stored
+    assert asyncio.run(mongo.cycle_models.find_one({"user_id": "alice"})) is None
+    monkeypatch.setattr(server, "db", mongo)
+    assert asyncio.run(server.get_cycle_model("alice")).last_start_date == date(2024, 3, 24)
+
+
+def test_rebuild_does_not_overwrite_a_fresher_model(mongo):
+    async def scenario():
+        for start in starts_from([28, 28]):
+            await server.create_period(server.PeriodCreate(start_date=start), user_id="alice")
+        stale = server.CycleModelState(user_id="alice", half_life=1.0)
+        await mongo.cycle_models.insert_one(server.serialize_for_mongo(stale.dict()))
+        fresh = await server.get_cycle_model("alice")
+        return fresh, await mongo.cycle_models.find_one({"user_id": "alice"})
+
+    fresh, stored = asyncio.run(scenario())
+    assert stored["half_life"] == server.EWMA_HALF_LIFE_CYCLES
+    assert stored["cycle_count"] == fresh.cycle_count == 2
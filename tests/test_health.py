@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+from datetime import date
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("mongomock_motor")
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server
+
+
+def test_readyz_does_not_run_warm_up_itself(mongo, monkeypatch):
+    calls = []
+
+    async def warm_up_db():
+        calls.append(1)
+        return False
+
+    monkeypatch.setattr(server, "warm_up_db", warm_up_db)
+    monkeypatch.setattr(server, "WARM_UP_RETRY_SECONDS", 60)
+    monkeypatch.setattr(server, "ANALYTICS_WORKERS", 0)
+
+    with TestClient(server.app) as api:
+        for _ in range(3):
+            response = api.get("/readyz")
+            assert response.status_code == 503
+            assert response.json()["status"] == "warming_up"
+
+    # Only the single background task attempted warm-up
+    assert calls == [1]
+
+
+def test_readyz_reports_latency_once_warm(api):
+    for _ in range(50):
+        if server.db_ready:
+            break
+        time.sleep(0.01)
+
+    response = api.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert "db_latency_ms" in response.json()
+
+
+def test_healthz_reports_pool_and_analytics(api):
+    body = api.get("/healthz").json()
+    assert body["status"] == "ok"
+    assert "max_pool_size" in body["pool"]
+    assert "waiting" in body["analytics"]
+
+
+def test_pool_monitor_counts_from_many_threads():
+    monitor = server.PoolMonitor()
+
+    def churn():
+        for _ in range(20000):
+            monitor.connection_checked_out(None)
+            monitor.connection_checked_in(None)
+        monitor.connection_created(None)
+
+    threads = [threading.Thread(target=churn) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = monitor.snapshot()
+    assert snapshot["checked_out"] == 0
+    assert snapshot["open_connections"] == 8
+
+
+def test_backfill_runs_after_ready_and_stamps_each_document_once(mongo, monkeypatch):
+    ready_during_backfill = []
+    backfill = server.backfill_sequences
+
+    async def backfill_sequences():
+        ready_during_backfill.append(server.db_ready)
+        await backfill()
+
+    async def scenario():
+        await mongo.periods.insert_many([
+            server.serialize_for_mongo(server.Period(user_id="alice", start_date=date(2020, 1, day)).dict())
+            for day in (1, 2, 3)
+        ])
+        await mongo.periods.update_many({}, {"$unset": {"seq": ""}})
+        monkeypatch.setattr(server, "backfill_sequences", backfill_sequences)
+        # Two workers warming up against the same database
+        await asyncio.gather(server.warm_up_until_ready(), server.warm_up_until_ready())
+        return await mongo.periods.find({}, {"_id": 0, "seq": 1}).to_list(None)
+
+    periods = asyncio.run(scenario())
+    assert ready_during_backfill == [True, True]
+    seqs = [period["seq"] for period in periods]
+    assert len(set(seqs)) == 3
+    feed = asyncio.run(server.get_period_changes(since=0, limit=500, user_id="alice"))
+    assert len(feed.upserted) == 3
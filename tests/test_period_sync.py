@@ -0,0 +1,118 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+import server
+
+
+def create(start: str, user_id: str = "alice") -> server.Period:
+    return asyncio.run(server.create_period(
+        server.PeriodCreate(start_date=date.fromisoformat(start)), user_id=user_id
+    ))
+
+
+def changes(since: int = 0, user_id: str = "alice") -> server.PeriodChanges:
+    return asyncio.run(server.get_period_changes(since=since, limit=500, user_id=user_id))
+
+
+def test_changes_feed_returns_writes_after_cursor(mongo):
+    first = create("2025-01-01")
+    second = create("2025-01-29")
+
+    feed = changes()
+    assert [p.id for p in feed.upserted] == [first.id, second.id]
+    assert feed.cursor == 2
+
+    asyncio.run(server.update_period(first.id, server.PeriodUpdate(notes="x"), user_id="alice"))
+    asyncio.run(server.delete_period(second.id, user_id="alice"))
+
+    delta = changes(feed.cursor)
+    assert [p.id for p in delta.upserted] == [first.id]
+    assert delta.deleted == [second.id]
+    assert delta.cursor == 4
+
+
+def test_changes_feed_stops_before_write_in_flight(mongo):
+    async def scenario():
+        async with server.allocate_sequence("alice") as slow_seq:
+            # A later write lands while the earlier one is still being stored
+            await server.create_period(server.PeriodCreate(start_date=date(2025, 2, 1)), user_id="alice")
+            during = await server.get_period_changes(since=0, limit=500, user_id="alice")
+            await mongo.periods.insert_one(server.serialize_for_mongo(
+                server.Period(user_id="alice", start_date=date(2025, 1, 1), seq=slow_seq).dict()
+            ))
+        after = await server.get_period_changes(since=during.cursor, limit=500, user_id="alice")
+        return slow_seq, during, after
+
+    slow_seq, during, after = asyncio.run(scenario())
+    assert slow_seq == 1
+    assert during.cursor == 0 and during.upserted == []
+    assert [p.seq for p in after.upserted] == [1, 2]
+    assert after.cursor == 2
+
+
+def test_abandoned_write_releases_feed_after_timeout(mongo):
+    async def scenario():
+        await mongo.counters.insert_one({
+            "_id": "periods:alice", "seq": 3,
+            "in_flight": [{"seq": 3, "allocated_at": server.datetime(2020, 1, 1)}]
+        })
+        return await server.stable_sequence("alice")
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_late_release_after_timeout_does_not_skip_later_writes(mongo):
+    async def scenario():
+        slow = server.allocate_sequence("alice")
+        assert await slow.__aenter__() == 1
+        await mongo.counters.update_one(
+            {"_id": "periods:alice"}, {"$set": {"in_flight.0.allocated_at": server.datetime(2020, 1, 1)}}
+        )
+        reclaimed = await server.stable_sequence("alice")
+
+        fast = server.allocate_sequence("alice")
+        assert await fast.__aenter__() == 2
+        # The timed-out writer finally finishes while a newer write is still in flight
+        await slow.__aexit__(None, None, None)
+        during = await server.stable_sequence("alice")
+        await fast.__aexit__(None, None, None)
+        return reclaimed, during, await server.stable_sequence("alice")
+
+    assert asyncio.run(scenario()) == (1, 1, 2)
+
+
+def test_each_allocation_times_out_on_its_own(mongo):
+    async def scenario():
+        await mongo.counters.insert_one({
+            "_id": "periods:alice", "seq": 5,
+            "in_flight": [
+                {"seq": 2, "allocated_at": server.datetime(2020, 1, 1)},
+                {"seq": 4, "allocated_at": server.datetime.utcnow()}
+            ]
+        })
+        return await server.stable_sequence("alice")
+
+    # A user who keeps writing doesn't keep a dead writer's allocation alive
+    assert asyncio.run(scenario()) == 3
+
+
+def test_update_of_missing_period_does_not_use_a_sequence(mongo):
+    create("2025-01-01")
+    with pytest.raises(server.HTTPException) as error:
+        asyncio.run(server.update_period("missing", server.PeriodUpdate(notes="x"), user_id="alice"))
+    assert error.value.status_code == 404
+    assert create("2025-01-29").seq == 2
+
+
+def test_concurrent_creates_get_distinct_sequences(mongo):
+    async def scenario():
+        return await asyncio.gather(*(
+            server.create_period(server.PeriodCreate(start_date=date(2025, 1, day)), user_id="alice")
+            for day in range(1, 11)
+        ))
+
+    periods = asyncio.run(scenario())
+    assert sorted(p.seq for p in periods) == list(range(1, 11))
+    assert changes().cursor == 10
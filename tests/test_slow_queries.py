@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import server
+
+
+def command_event(name, command, request_id=1, **fields):
+    return SimpleNamespace(command_name=name, command=command, database_name="test_database",
+                           connection_id=("localhost", 27017), request_id=request_id, **fields)
+
+
+def test_query_shape_replaces_literals_with_types():
+    shape = server.query_shape({"user_id": "alice", "seq": {"$gt": 3}, "id": {"$in": ["a", "b"]}})
+    assert shape == {"user_id": "str", "seq": {"$gt": "int"}, "id": {"$in": ["str", "str"]}}
+
+
+def test_count_reply_documents():
+    assert server.count_reply_documents("find", {"cursor": {"firstBatch": [{}, {}, {}]}}) == 3
+    assert server.count_reply_documents("aggregate", {"cursor": {"nextBatch": [{}]}}) == 1
+    assert server.count_reply_documents("delete", {"n": 4}) == 4
+    assert server.count_reply_documents("findAndModify", {"value": {"seq": 2}}) == 1
+    assert server.count_reply_documents("findAndModify", {"value": None}) == 0
+
+
+def test_fast_commands_are_not_shaped_or_logged(monkeypatch, caplog):
+    monitor = server.SlowQueryMonitor()
+    monkeypatch.setattr(server, "SLOW_QUERY_MS", 100)
+    monkeypatch.setattr(server, "query_shape", lambda value: (_ for _ in ()).throw(AssertionError))
+
+    command = {"find": "periods", "filter": {"user_id": "alice"}}
+    monitor.started(command_event("find", command))
+    assert monitor.pending[(("localhost", 27017), 1)][3] is command
+
+    with caplog.at_level(logging.WARNING, logger="server"):
+        monitor.succeeded(command_event("find", command, duration_micros=5000,
+                                        reply={"cursor": {"firstBatch": []}}))
+    assert monitor.pending == {}
+    assert caplog.records == []
+
+
+def test_slow_command_logs_route_shape_and_captures_plan(monkeypatch, caplog):
+    captured = []
+
+    async def capture_query_plan(record, command):
+        captured.append((record, command))
+
+    monkeypatch.setattr(server, "SLOW_QUERY_MS", 100)
+    monkeypatch.setattr(server, "SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(server, "capture_query_plan", capture_query_plan)
+
+    async def scenario():
+        monitor = server.SlowQueryMonitor()
+        monitor.loop = asyncio.get_running_loop()
+        server.current_route.set("GET /api/periods/changes")
+        command = {"find": "periods", "filter": {"user_id": "alice"}, "lsid": {}, "$db": "test_database"}
+        monitor.started(command_event("find", command))
+        monitor.succeeded(command_event("find", command, duration_micros=250000,
+                                        reply={"cursor": {"firstBatch": [{}, {}]}}))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    with caplog.at_level(logging.WARNING, logger="server"):
+        asyncio.run(scenario())
+
+    record, explainable = captured[0]
+    assert record["route"] == "GET /api/periods/changes"
+    assert record["filter_shape"] == {"user_id": "str"}
+    assert record["documents"] == 2
+    assert explainable == {"find": "periods", "filter": {"user_id": "alice"}}
+    assert "took 250.0 ms" in caplog.records[0].getMessage()
+
+
+def test_route_template_is_recorded_without_ids(api, monkeypatch):
+    period = api.post("/api/periods", json={"start_date": "2025-01-01"}).json()
+
+    seen = []
+    original = server.serialize_for_mongo
+
+    def serialize_for_mongo(data):
+        seen.append(server.current_route.get())
+        return original(data)
+
+    monkeypatch.setattr(server, "serialize_for_mongo", serialize_for_mongo)
+    api.put(f"/api/periods/{period['id']}", json={"notes": "x"})
+
+    assert seen == ["PUT /api/periods/{period_id}"]
+
+
+def test_get_more_is_traced_to_the_originating_find(monkeypatch, caplog):
+    monitor = server.SlowQueryMonitor()
+    monkeypatch.setattr(server, "SLOW_QUERY_MS", 100)
+    server.current_route.set("GET /api/periods")
+
+    find = {"find": "periods", "filter": {"user_id": "alice"}}
+    monitor.started(command_event("find", find, request_id=1))
+    monitor.succeeded(command_event("find", find, request_id=1, duration_micros=5000,
+                                    reply={"cursor": {"id": 42, "firstBatch": [{}] * 101}}))
+
+    server.current_route.set(None)  # getMore may run outside the request context
+    get_more = {"getMore": 42, "collection": "periods"}
+    monitor.started(command_event("getMore", get_more, request_id=2))
+    monitor.succeeded(command_event("getMore", get_more, request_id=2, duration_micros=5000,
+                                    reply={"cursor": {"id": 42, "nextBatch": [{}] * 500}}))
+    with caplog.at_level(logging.WARNING, logger="server"):
+        monitor.started(command_event("getMore", get_more, request_id=3))
+        monitor.succeeded(command_event("getMore", get_more, request_id=3, duration_micros=150000,
+                                        reply={"cursor": {"id": 0, "nextBatch": [{}] * 399}}))
+
+    message = caplog.records[0].getMessage()
+    assert "Slow Mongo getMore on periods" in message
+    assert "route=GET /api/periods" in message
+    assert "filter={'user_id': 'str'}" in message
+    assert "documents=1000" in message
+    assert monitor.cursors == {} and monitor.pending == {}
+
+
+def test_killed_cursors_are_forgotten():
+    monitor = server.SlowQueryMonitor()
+    find = {"find": "periods", "filter": {}}
+    monitor.started(command_event("find", find))
+    monitor.succeeded(command_event("find", find, duration_micros=10,
+                                    reply={"cursor": {"id": 7, "firstBatch": [{}]}}))
+    assert 7 in monitor.cursors
+
+    monitor.started(command_event("killCursors", {"killCursors": "periods", "cursors": [7]}, request_id=2))
+    assert monitor.cursors == {}